@@ -0,0 +1,102 @@
+# bench_date_index.py
+#
+# Latency of a (team, start_date, end_date) match query, two ways:
+#   mask   - boolean masks over all of match_df (home/away id, string date compares)
+#   index  - TeamData.team_matches_between: per-team date-sorted rows, two binary searches
+#
+#   python benchmarks/bench_date_index.py                          # synthetic, European-table sized
+#   python benchmarks/bench_date_index.py --data team_app/team.pkl
+
+import argparse
+import os
+import pickle
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'team_app'))
+from team_store import TeamData
+
+
+def synthetic_tables(n_matches, n_teams, seed=0):
+    # Same shape as the European Soccer Database: ~26k matches, ~300 teams, 2008-2016
+    rng = np.random.default_rng(seed)
+    home = rng.integers(0, n_teams, n_matches)
+    away = (home + rng.integers(1, n_teams, n_matches)) % n_teams
+    days = rng.integers(0, 8 * 365, n_matches)
+    dates = pd.Timestamp('2008-08-01') + pd.to_timedelta(days, unit='D')
+    match_df = pd.DataFrame({
+        'home_team_api_id': home + 1000,
+        'away_team_api_id': away + 1000,
+        'date': dates.strftime('%Y-%m-%d 00:00:00'),
+        'home_team_goal': rng.integers(0, 5, n_matches),
+        'away_team_goal': rng.integers(0, 5, n_matches),
+    })
+    team_df = pd.DataFrame({'team_api_id': np.arange(n_teams) + 1000,
+                            'team_long_name': [f"Team {i}" for i in range(n_teams)]})
+    return team_df, match_df
+
+
+def mask_query(match_df, team_id, start_date, end_date):
+    # What the team query used to do on every request
+    mask = ((match_df['home_team_api_id'] == team_id) | (match_df['away_team_api_id'] == team_id)) & \
+           (match_df['date'] >= start_date) & (match_df['date'] <= end_date + ' 23:59:59')
+    return match_df[mask]
+
+
+def time_queries(fn, queries, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for q in queries:
+            fn(*q)
+        best = min(best, time.perf_counter() - started)
+    return best / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default=None, help="team.pkl with team_df and match_df")
+    parser.add_argument('--matches', type=int, default=26000)
+    parser.add_argument('--teams', type=int, default=300)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.data:
+        with open(args.data, 'rb') as f:
+            td = pickle.load(f)
+        team_df, match_df = td['team_df'], td['match_df']
+    else:
+        team_df, match_df = synthetic_tables(args.matches, args.teams)
+
+    started = time.perf_counter()
+    data = TeamData(team_df, match_df, mtime=0)
+    build = time.perf_counter() - started
+
+    # Random teams and season-like ranges
+    rng = np.random.default_rng(1)
+    team_ids = list(data.matches_by_team)
+    years = rng.integers(2008, 2016, args.queries)
+    queries = [(team_ids[rng.integers(len(team_ids))], f"{y}-08-01", f"{y + 1}-05-31") for y in years]
+
+    # Both must return the same matches
+    for q in queries[:50]:
+        expected = np.sort(mask_query(match_df, *q).index.to_numpy())
+        got = np.sort(data.team_matches_between(*q).index.to_numpy())
+        assert np.array_equal(expected, got), q
+
+    mask = time_queries(lambda *q: mask_query(match_df, *q), queries, args.repeat)
+    index = time_queries(lambda *q: data.team_match_rows(*q), queries, args.repeat)
+    frame = time_queries(lambda *q: data.team_matches_between(*q), queries, args.repeat)
+
+    print(f"{len(match_df)} matches, {len(team_ids)} teams, index built in {build * 1e3:.1f} ms")
+    print(f"{'query':<22}{'us/query':>12}{'speedup':>10}")
+    print(f"{'mask scan':<22}{mask * 1e6:>12.1f}{1.0:>10.1f}")
+    print(f"{'index (rows)':<22}{index * 1e6:>12.1f}{mask / index:>10.1f}")
+    print(f"{'index (DataFrame)':<22}{frame * 1e6:>12.1f}{mask / frame:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# bench_packing.py
+#
+# Throughput of PlayerRatingLSTM on variable-length histories, batched three ways:
+#   padded    - random batches padded to their longest history, LSTM runs every padded step
+#   packed    - same batches through pack_padded_sequence (model(x, lengths))
+#   bucketed  - length-bucketed batches (BucketBatchSampler), packed
+#
+#   python benchmarks/bench_packing.py --samples 20000 --max-length 40 --train
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from playernn import PlayerRatingLSTM
+from player_data import SequenceDataset, make_loader
+
+
+def run(model, loader, mode, train, optimizer=None):
+    n = 0
+    padded_steps = real_steps = 0
+    started = time.perf_counter()
+    for X, y, lengths in loader:
+        if mode == 'padded':
+            out, _ = model.lstm(X)
+            pred = model.fc(out[torch.arange(len(X)), lengths - 1])
+        else:
+            pred = model(X, lengths)
+        if train:
+            loss = torch.nn.functional.mse_loss(pred, y)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+        n += len(X)
+        padded_steps += X.shape[0] * X.shape[1]
+        real_steps += int(lengths.sum())
+    elapsed = time.perf_counter() - started
+    return n / elapsed, real_steps / padded_steps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--samples', type=int, default=20000)
+    parser.add_argument('--features', type=int, default=40)
+    parser.add_argument('--max-length', type=int, default=40)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--train', action='store_true', help="include backward + optimizer step")
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    # Skewed history lengths, like players/teams with few vs. many records
+    rng = np.random.default_rng(0)
+    lengths = np.minimum(rng.geometric(4.0 / args.max_length, args.samples), args.max_length)
+    starts = np.r_[0, np.cumsum(lengths)[:-1]]
+    steps = rng.standard_normal((int(lengths.sum()), args.features)).astype(np.float32)
+    ds = SequenceDataset(steps, starts, lengths, rng.standard_normal(args.samples))
+
+    model = PlayerRatingLSTM(input_size=args.features)
+    model.train(args.train)
+    optimizer = torch.optim.Adam(model.parameters()) if args.train else None
+
+    print(f"{args.samples} histories, mean length {lengths.mean():.1f}, max {lengths.max()}, "
+          f"batch {args.batch_size}, {'train' if args.train else 'inference'}")
+    print(f"{'mode':<10}{'samples/s':>12}{'real/padded steps':>20}")
+    for mode, bucket in (('padded', False), ('packed', False), ('bucketed', True)):
+        loader = make_loader(ds, args.batch_size, shuffle=True, bucket=bucket)
+        with torch.set_grad_enabled(args.train):
+            run(model, loader, mode, args.train, optimizer)          # warm-up
+            rate, density = run(model, loader, mode, args.train, optimizer)
+        print(f"{mode:<10}{rate:>12,.0f}{density:>20.2f}")
+
+
+if __name__ == '__main__':
+    main()
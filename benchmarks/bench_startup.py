@@ -0,0 +1,59 @@
+# bench_startup.py
+#
+# Cold start of a team app worker, per INFERENCE_MODE: time to `import server`
+# (imports, model load, warm-up) and to the first /predict response, each in a
+# fresh interpreter.
+#
+#   python benchmarks/bench_startup.py --app-dir team_app --modes fused scripted
+#
+# The app dir is the working directory holding the artifacts of each mode
+# (scripted: python export_model.py).
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = r"""
+import json, sys, time
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+client = server.app.test_client()
+r = client.post('/predict', json={'rows': [[0.0] * server.INPUT_SIZE]})
+assert r.status_code == 200, r.get_data()
+first = time.perf_counter()
+heavy = [m for m in ('pandas', 'matplotlib', 'sklearn', 'playernn') if m in sys.modules]
+print(json.dumps({'import_s': imported - started, 'first_predict_s': first - imported, 'loaded': heavy}))
+"""
+
+
+def run_once(app_dir, mode):
+    env = dict(os.environ, INFERENCE_MODE=mode)
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    paths = [root, os.path.join(root, 'team_app'), env.get('PYTHONPATH')]
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, paths))
+    out = subprocess.run([sys.executable, '-W', 'ignore', '-c', CHILD], cwd=app_dir, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--app-dir', default=os.path.join(os.path.dirname(__file__), '..', 'team_app'))
+    parser.add_argument('--modes', nargs='+', default=['lstm', 'fused', 'scripted'])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'import s':>10}{'1st predict ms':>16}{'total s':>10}  heavy modules loaded")
+    for mode in args.modes:
+        runs = [run_once(args.app_dir, mode) for _ in range(args.repeat)]
+        imp = statistics.median(r['import_s'] for r in runs)
+        first = statistics.median(r['first_predict_s'] for r in runs)
+        print(f"{mode:<10}{imp:>10.2f}{first * 1e3:>16.1f}{imp + first:>10.2f}  {', '.join(runs[-1]['loaded']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+# bench_suite.py
+#
+# Local performance suite for the model and the team app, on synthetic
+# 40-feature data (no real artifacts needed):
+#   forward  - PlayerRatingLSTM / FastPlayerRatingLSTM / NumPy forward, per batch size and torch threads
+#   scaler   - StandardScaler.transform per batch size
+#   predict  - POST /predict (JSON and binary) through the Flask test client, per concurrent clients
+#   upload   - POST / CSV upload per upload size, plus a per-stage breakdown
+#              (read_csv, scaler.transform, forward, to_html, plot)
+# Every result has latency percentiles (p50/p90/p99 ms) and rows/s.
+#
+#   python benchmarks/bench_suite.py --json results.json
+#   python benchmarks/bench_suite.py --quick --compare results.json    # flag regressions vs. a saved run
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+APP_DIR = os.path.join(ROOT, 'team_app')
+sys.path[:0] = [ROOT, APP_DIR]
+
+import torch
+from playernn import PlayerRatingLSTM
+
+INPUT_SIZE = 40
+METRICS = ('p50_ms', 'p90_ms', 'p99_ms', 'mean_ms', 'rows_per_s', 'calls')
+
+INDEX_TEMPLATE = "{{ error }}|{{ result|length if result else 0 }}|{{ plot_url }}"
+
+
+def measure(fn, rows, min_time=0.5, min_calls=5):
+    """Call fn until min_time seconds and min_calls calls have passed; latency stats per call."""
+    fn()                                   # warm-up
+    times = []
+    while len(times) < min_calls or sum(times) < min_time:
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    t = np.array(times) * 1000.0
+    return {'p50_ms': float(np.percentile(t, 50)), 'p90_ms': float(np.percentile(t, 90)),
+            'p99_ms': float(np.percentile(t, 99)), 'mean_ms': float(t.mean()),
+            'rows_per_s': rows * len(t) / (t.sum() / 1000.0), 'calls': len(t)}
+
+
+def measure_concurrent(fn, rows, clients, min_time=0.5, min_calls=5):
+    """measure() with `clients` threads calling fn at once; rows/s is aggregate."""
+    if clients == 1:
+        return measure(fn, rows, min_time, min_calls)
+    fn()
+    per_client = []
+    deadline = time.perf_counter() + min_time
+
+    def client():
+        times = []
+        while len(times) < min_calls or time.perf_counter() < deadline:
+            started = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - started)
+        return times
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        per_client = list(pool.map(lambda _: client(), range(clients)))
+    wall = time.perf_counter() - started
+    t = np.concatenate(per_client) * 1000.0
+    return {'p50_ms': float(np.percentile(t, 50)), 'p90_ms': float(np.percentile(t, 90)),
+            'p99_ms': float(np.percentile(t, 99)), 'mean_ms': float(t.mean()),
+            'rows_per_s': rows * len(t) / wall, 'calls': len(t)}
+
+
+def synthetic_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal((n, INPUT_SIZE)) * 10 + 50).astype(np.float32)
+
+
+def write_artifacts(work_dir):
+    """Random-init weights, a fitted scaler and a small team.pkl: what server.py loads at import."""
+    import joblib
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+
+    torch.manual_seed(0)
+    torch.save(PlayerRatingLSTM(input_size=INPUT_SIZE).state_dict(),
+               os.path.join(work_dir, 'player_nn_model_weights.pth'))
+    joblib.dump(StandardScaler().fit(synthetic_rows(10000)), os.path.join(work_dir, 'scaler.pkl'))
+
+    rng = np.random.default_rng(0)
+    n_teams, n_matches = 20, 2000
+    home = rng.integers(0, n_teams, n_matches)
+    match_df = pd.DataFrame({
+        'home_team_api_id': home,
+        'away_team_api_id': (home + rng.integers(1, n_teams, n_matches)) % n_teams,
+        'date': (pd.Timestamp('2010-08-01') + pd.to_timedelta(rng.integers(0, 1800, n_matches), unit='D'))
+                .strftime('%Y-%m-%d 00:00:00'),
+        'season': '2010/2011',
+        'home_team_goal': rng.integers(0, 5, n_matches),
+        'away_team_goal': rng.integers(0, 5, n_matches),
+    })
+    team_df = pd.DataFrame({'team_api_id': np.arange(n_teams),
+                            'team_long_name': [f"Team {i:02d}" for i in range(n_teams)]})
+    pd.to_pickle({'team_df': team_df, 'match_df': match_df}, os.path.join(work_dir, 'team.pkl'))
+
+
+def upload_csv(n, seed=0):
+    import pandas as pd
+    df = pd.DataFrame(synthetic_rows(n, seed), columns=[f"f{i}" for i in range(INPUT_SIZE)])
+    df['Actual_Team_Goals'] = np.random.default_rng(seed).integers(0, 7, n)
+    return df.to_csv(index=False).encode()
+
+
+def bench_forward(results, batch_sizes, threads, min_time):
+    model = PlayerRatingLSTM(input_size=INPUT_SIZE).eval()
+    fast = model.to_fast_inference()
+    impls = {'lstm': model, 'fast': fast, 'numpy': fast.to_numpy()}
+    default_threads = torch.get_num_threads()
+    for t in threads:
+        torch.set_num_threads(t)
+        for b in batch_sizes:
+            X = torch.as_tensor(synthetic_rows(b)).unsqueeze(1)
+            Xn = X.numpy()
+            for name, m in impls.items():
+                if name == 'numpy':
+                    fn = lambda: m(Xn)
+                else:
+                    def fn(m=m):
+                        with torch.no_grad():
+                            m(X)
+                results.append({'bench': 'forward', 'impl': name, 'batch': b, 'threads': t,
+                                **measure(fn, b, min_time)})
+    torch.set_num_threads(default_threads)
+
+
+def bench_scaler(results, scaler, batch_sizes, min_time):
+    for b in batch_sizes:
+        X = synthetic_rows(b)
+        results.append({'bench': 'scaler', 'impl': 'transform', 'batch': b,
+                        **measure(lambda: scaler.transform(X), b, min_time)})
+
+
+def bench_predict(results, server, batch_sizes, clients, min_time):
+    client = server.app.test_client()
+    for b in batch_sizes:
+        X = synthetic_rows(b, seed=b)
+        body_json = {'rows': X.tolist()}
+        body_bin = X.astype('<f4').tobytes()
+
+        def post_json():
+            r = client.post('/predict', json=body_json)
+            assert r.status_code == 200, r.get_data()
+
+        def post_binary():
+            r = client.post('/predict?format=binary', data=body_bin, content_type='application/octet-stream')
+            assert r.status_code == 200, r.get_data()
+
+        for c in clients:
+            for name, fn in (('json', post_json), ('binary', post_binary)):
+                results.append({'bench': 'predict', 'impl': name, 'batch': b, 'clients': c,
+                                **measure_concurrent(fn, b, c, min_time)})
+
+
+def bench_upload(results, server, upload_sizes, min_time):
+    import pandas as pd
+    client = server.app.test_client()
+    for n in upload_sizes:
+        data = upload_csv(n, seed=n)
+
+        def post():
+            r = client.post('/', data={'csvfile': (io.BytesIO(data), 'upload.csv')},
+                            content_type='multipart/form-data')
+            assert r.status_code == 200, r.get_data()
+
+        results.append({'bench': 'upload', 'impl': 'route', 'rows': n, **measure(post, n, min_time)})
+
+        # The same work stage by stage, outside Flask
+        df = pd.read_csv(io.BytesIO(data))
+        X = df.drop(columns=['Actual_Team_Goals'])
+        Xs = server.preprocess(X)
+        df['Predicted_Team_Goals'] = np.rint(server.run_model(Xs)).astype(int)
+        counts = server.goal_histogram(df)
+
+        def plot():
+            server.render_goal_distribution.cache_clear()
+            server.render_goal_distribution(counts)
+
+        stages = (('read_csv', lambda: pd.read_csv(io.BytesIO(data))),
+                  ('scaler_transform', lambda: server.preprocess(X)),
+                  ('forward', lambda: server.run_model(Xs)),
+                  ('to_html', lambda: df.to_html(classes='data', index=False)),
+                  ('plot', plot))
+        for stage, fn in stages:
+            results.append({'bench': 'upload_stage', 'impl': stage, 'rows': n, **measure(fn, n, min_time)})
+
+
+def result_key(r):
+    return tuple(sorted((k, v) for k, v in r.items() if k not in METRICS))
+
+
+def compare(results, baseline_path, threshold):
+    """Print p50 and rows/s ratios against a saved run; returns the number of regressions."""
+    with open(baseline_path) as f:
+        baseline = {result_key(r): r for r in json.load(f)['results']}
+    regressions = 0
+    print(f"\nvs. {baseline_path} (regression: p50 more than {threshold:.0%} slower)")
+    for r in results:
+        old = baseline.get(result_key(r))
+        if old is None:
+            continue
+        ratio = r['p50_ms'] / old['p50_ms'] if old['p50_ms'] else float('inf')
+        flag = 'REGRESSION' if ratio > 1 + threshold else ''
+        regressions += bool(flag)
+        label = ' '.join(f"{k}={v}" for k, v in r.items() if k not in METRICS)
+        print(f"  {label:<55} p50 {old['p50_ms']:9.3f} -> {r['p50_ms']:9.3f} ms  x{ratio:5.2f}  {flag}")
+    return regressions
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'torch': torch.__version__, 'numpy': np.__version__, 'cpus': os.cpu_count(),
+            'machine': platform.machine(), 'torch_threads': torch.get_num_threads()}
+
+
+def print_table(results):
+    for bench in dict.fromkeys(r['bench'] for r in results):
+        rows = [r for r in results if r['bench'] == bench]
+        params = [k for k in rows[0] if k not in METRICS and k != 'bench']
+        widths = {p: max(10, *(len(str(r[p])) for r in rows)) + 2 for p in params}
+        print(f"\n[{bench}]")
+        print(''.join(f"{p:>{widths[p]}}" for p in params) +
+              f"{'p50 ms':>11}{'p90 ms':>11}{'p99 ms':>11}{'rows/s':>14}")
+        for r in rows:
+            print(''.join(f"{str(r[p]):>{widths[p]}}" for p in params) +
+                  f"{r['p50_ms']:>11.3f}{r['p90_ms']:>11.3f}{r['p99_ms']:>11.3f}{r['rows_per_s']:>14,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model and team app benchmark suite")
+    parser.add_argument('--only', nargs='+', choices=['forward', 'scaler', 'predict', 'upload'],
+                        default=['forward', 'scaler', 'predict', 'upload'])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16, 64, 256, 1024])
+    parser.add_argument('--threads', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--upload-sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--min-time', type=float, default=0.5, help="seconds per measurement")
+    parser.add_argument('--quick', action='store_true', help="small sizes and short runs, for smoke checks")
+    parser.add_argument('--inference-mode', default='fused', help="server INFERENCE_MODE (needs its artifacts)")
+    parser.add_argument('--json', default=None, help="write results + environment here")
+    parser.add_argument('--compare', default=None, help="earlier --json output to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args()
+    if args.quick:
+        args.batch_sizes, args.threads, args.clients = [1, 64], [1], [1, 4]
+        args.upload_sizes, args.min_time = [100, 1000], 0.1
+
+    results = []
+    if 'forward' in args.only:
+        bench_forward(results, args.batch_sizes, args.threads, args.min_time)
+
+    if {'scaler', 'predict', 'upload'} & set(args.only):
+        # server.py loads its artifacts from the working directory at import
+        work_dir = tempfile.mkdtemp(prefix='team_app_bench_')
+        write_artifacts(work_dir)
+        os.chdir(work_dir)
+        os.environ.setdefault('INFERENCE_MODE', args.inference_mode)
+        os.environ.setdefault('PREDICT_CACHE_ROWS', '0')   # measure the model, not cache hits
+        import server
+        if not os.path.exists(os.path.join(APP_DIR, 'templates', 'index.html')):
+            os.makedirs(os.path.join(work_dir, 'templates'))
+            with open(os.path.join(work_dir, 'templates', 'index.html'), 'w') as f:
+                f.write(INDEX_TEMPLATE)
+            server.app.template_folder = os.path.join(work_dir, 'templates')
+
+        if 'scaler' in args.only and server.scaler is not None:
+            bench_scaler(results, server.scaler, args.batch_sizes, args.min_time)
+        if 'predict' in args.only:
+            bench_predict(results, server, args.batch_sizes, args.clients, args.min_time)
+        if 'upload' in args.only:
+            bench_upload(results, server, args.upload_sizes, args.min_time)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+        print(f"\nWrote {len(results)} results to {args.json}")
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
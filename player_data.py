@@ -0,0 +1,280 @@
+import json
+import os
+import pickle
+import numpy as np
+import torch
+from torch.utils.data import Dataset, DataLoader, Sampler
+
+
+class ArrayDataset(Dataset):
+    """
+    (X, y) samples over in-memory or memory-mapped (np.load(..., mmap_mode='r'))
+    arrays, so the training set does not have to fit in RAM or device memory.
+    X: (n_samples, n_features) or (n_samples, seq_len, n_features)
+    y: (n_samples,)
+    Yields X as (seq_len, n_features) float32 (seq_len=1 for 2-D X) and y as (1,).
+    """
+    def __init__(self, X, y):
+        if len(X) != len(y):
+            raise ValueError(f"X has {len(X)} rows but y has {len(y)}")
+        self.X = X
+        self.y = np.reshape(y, (len(y),))
+
+    def __len__(self):
+        return len(self.X)
+
+    @property
+    def n_features(self):
+        return self.X.shape[-1]
+
+    def __getitem__(self, i):
+        X, y = self.__getitems__([i])
+        return X[0], y[0]
+
+    def __getitems__(self, indices):
+        # Whole-batch fetch: one sorted gather per batch (sequential reads on a
+        # memmap) instead of one __getitem__ call per sample
+        idx = np.asarray(indices)
+        order = np.argsort(idx)
+        X = np.empty((len(idx),) + self.X.shape[1:], dtype=np.float32)
+        y = np.empty(len(idx), dtype=np.float32)
+        X[order] = self.X[idx[order]]
+        y[order] = self.y[idx[order]]
+        X = torch.from_numpy(X)
+        if X.dim() == 2:
+            X = X.unsqueeze(1)
+        return X, torch.from_numpy(y).unsqueeze(1)
+
+
+def pad_histories(steps, starts, lengths):
+    """
+    Right-pad histories steps[starts[i] : starts[i] + lengths[i]] into one
+    (batch, longest, n_features) float32 tensor, zeros past each length.
+    Returns (X, lengths) for PlayerRatingLSTM(X, lengths).
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    width = max(int(lengths.max()), 1) if len(lengths) else 1
+    offsets = np.arange(width)
+    valid = offsets < lengths[:, None]                    # (batch, width)
+    rows = (starts[:, None] + offsets)[valid]             # row of each real step
+    X = np.zeros((len(lengths), width, steps.shape[-1]), dtype=np.float32)
+    X[valid] = steps[rows]
+    return torch.from_numpy(X), torch.from_numpy(lengths)
+
+
+class SequenceDataset(Dataset):
+    """
+    Variable-length histories stored without padding. `steps` holds the
+    feature rows (n_rows, n_features); sample i is the history
+    steps[starts[i] : starts[i] + lengths[i]] with target y[i].
+    Batches are right-padded to the longest history in the batch and come
+    with their lengths, for PlayerRatingLSTM(x, lengths) / pack_padded_sequence.
+    """
+    def __init__(self, steps, starts, lengths, y):
+        self.steps = steps
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.y = np.reshape(y, (len(y),))
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def n_features(self):
+        return self.steps.shape[-1]
+
+    def __getitem__(self, i):
+        X, y, lengths = self.__getitems__([i])
+        return X[0], y[0], lengths[0]
+
+    def __getitems__(self, indices):
+        idx = np.asarray(indices)
+        X, lengths = pad_histories(self.steps, self.starts[idx], self.lengths[idx])
+        y = np.asarray(self.y[idx], dtype=np.float32)
+        return X, torch.from_numpy(y).unsqueeze(1), lengths
+
+
+class BucketBatchSampler(Sampler):
+    """
+    Length-bucketed batches: indices are shuffled, cut into pools of
+    `pool_batches` batches, sorted by length inside each pool and batched, so
+    each batch holds similar lengths and little padding; batch order is then
+    shuffled again.
+    """
+    def __init__(self, lengths, batch_size, shuffle=True, pool_batches=50, seed=None):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.pool_batches = pool_batches
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        n = len(self.lengths)
+        order = self.rng.permutation(n) if self.shuffle else np.arange(n)
+        pool = self.batch_size * self.pool_batches
+        batches = []
+        for p in range(0, n, pool):
+            chunk = order[p:p + pool]
+            chunk = chunk[np.argsort(self.lengths[chunk], kind='stable')]
+            batches.extend(chunk[b:b + self.batch_size] for b in range(0, len(chunk), self.batch_size))
+        if self.shuffle:
+            self.rng.shuffle(batches)
+        return (b.tolist() for b in batches)
+
+
+def _collate_batch(batch):
+    # ArrayDataset.__getitems__ already returns a stacked (X, y) batch
+    return batch
+
+
+def make_loader(dataset, batch_size, shuffle=False, num_workers=0,
+                pin_memory=False, prefetch_factor=2, bucket=False):
+    """
+    DataLoader that fetches whole batches per call. With num_workers > 0,
+    batches are prepared in background processes, `prefetch_factor` per worker
+    ahead of the training loop; pin_memory enables async host-to-GPU copies.
+    bucket=True groups a SequenceDataset's histories by length.
+    """
+    kwargs = {}
+    if num_workers > 0:
+        kwargs.update(prefetch_factor=prefetch_factor, persistent_workers=True)
+    if bucket:
+        kwargs['batch_sampler'] = BucketBatchSampler(dataset.lengths, batch_size, shuffle=shuffle)
+    else:
+        kwargs.update(batch_size=batch_size, shuffle=shuffle)
+    return DataLoader(dataset, num_workers=num_workers, pin_memory=pin_memory,
+                      collate_fn=_collate_batch, **kwargs)
+
+
+# ---------------------------
+# On-disk dataset format
+# ---------------------------
+# A dataset is a directory holding one .npy file per array plus manifest.json:
+#   {"format_version": 1,
+#    "feature_cols": [...], "sequence_length": 3,
+#    "arrays": {"X_train": {"file": "X_train.npy", "shape": [...], "dtype": "float32"}, ...}}
+# Fixed-length datasets store X_train / y_train (/ X_val / y_val). Variable-
+# length history datasets store the shared feature rows once as `steps` plus
+# starts_<split>, lengths_<split> and y_<split> (see SequenceDataset).
+# Arrays are opened with np.load(mmap_mode='r'): opening is O(1), pages are
+# read on demand and shared between processes through the OS page cache.
+
+MANIFEST = 'manifest.json'
+BUNDLE_ARRAYS = ('X_train', 'y_train', 'X_val', 'y_val', 'X_tensor', 'y_tensor')
+
+
+def write_dataset(path, arrays, feature_cols=None, sequence_length=None):
+    """Write {name: array-like} as .npy files plus a manifest into directory `path`."""
+    os.makedirs(path, exist_ok=True)
+    entries = {}
+    for name, arr in arrays.items():
+        if arr is None:
+            continue
+        if isinstance(arr, torch.Tensor):
+            arr = arr.detach().cpu().numpy()
+        arr = np.asarray(arr)
+        np.save(os.path.join(path, name + '.npy'), arr)
+        entries[name] = {'file': name + '.npy', 'shape': list(arr.shape), 'dtype': str(arr.dtype)}
+    manifest = {
+        'format_version': 1,
+        'feature_cols': list(feature_cols) if feature_cols is not None else None,
+        'sequence_length': sequence_length,
+        'arrays': entries,
+    }
+    # Manifest last, and atomically: a directory with a manifest is complete
+    tmp = os.path.join(path, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+    return manifest
+
+
+def open_dataset(path):
+    """
+    Open a dataset directory. Returns (arrays, manifest) where arrays maps
+    each name in the manifest to a read-only memory-mapped ndarray.
+    """
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    arrays = {}
+    for name, entry in manifest['arrays'].items():
+        arr = np.load(os.path.join(path, entry['file']), mmap_mode='r')
+        if list(arr.shape) != entry['shape']:
+            raise ValueError(f"{name}: manifest says shape {entry['shape']}, file has {list(arr.shape)}")
+        arrays[name] = arr
+    return arrays, manifest
+
+
+def convert_pickle(pkl_path, out_dir):
+    """Convert a player_model_and_data.pkl-style bundle into a dataset directory."""
+    with open(pkl_path, 'rb') as f:
+        bundle = pickle.load(f)
+    arrays = {k: bundle[k] for k in BUNDLE_ARRAYS if bundle.get(k) is not None}
+    return write_dataset(out_dir, arrays,
+                         feature_cols=bundle.get('feature_cols'),
+                         sequence_length=bundle.get('sequence_length'))
+
+
+def load_histories(path):
+    """
+    Open a variable-length history dataset directory. Returns
+    (train, val) SequenceDatasets; val is None if there is no val split.
+    """
+    arrays, _ = open_dataset(path)
+    splits = []
+    for split in ('train', 'val'):
+        if f'starts_{split}' not in arrays:
+            splits.append(None)
+            continue
+        splits.append(SequenceDataset(arrays['steps'], arrays[f'starts_{split}'],
+                                      arrays[f'lengths_{split}'], arrays[f'y_{split}']))
+    return tuple(splits)
+
+
+def is_history_dataset(path):
+    if not os.path.exists(os.path.join(path, MANIFEST)):
+        return False
+    with open(os.path.join(path, MANIFEST)) as f:
+        return 'steps' in json.load(f)['arrays']
+
+
+def load_arrays(path):
+    """
+    Load X_train / y_train (and optional X_val / y_val) from either a pickle
+    bundle or a dataset directory (see write_dataset; plain .npy files without
+    a manifest also work), whose arrays are opened memory-mapped.
+    Returns a dict with None for missing validation arrays.
+    """
+    if os.path.isdir(path):
+        if os.path.exists(os.path.join(path, MANIFEST)):
+            arrays, _ = open_dataset(path)
+            npy = arrays.get
+        else:
+            def npy(name):
+                f = os.path.join(path, name + '.npy')
+                return np.load(f, mmap_mode='r') if os.path.exists(f) else None
+        data = {k: npy(k) for k in ('X_train', 'y_train', 'X_val', 'y_val')}
+    else:
+        with open(path, 'rb') as f:
+            bundle = pickle.load(f)
+        data = {k: bundle.get(k) for k in ('X_train', 'y_train', 'X_val', 'y_val')}
+        data = {k: None if v is None else np.asarray(v) for k, v in data.items()}
+    if data['X_train'] is None or data['y_train'] is None:
+        raise KeyError(f"{path} has no X_train / y_train")
+    return data
+
+
+if __name__ == "__main__":
+    # Convert a pickle bundle into the memory-mapped dataset format:
+    #   python player_data.py player_model_and_data.pkl player_dataset/
+    import sys
+    if len(sys.argv) != 3:
+        sys.exit("usage: python player_data.py BUNDLE.pkl OUT_DIR")
+    manifest = convert_pickle(sys.argv[1], sys.argv[2])
+    for name, entry in manifest['arrays'].items():
+        print(f"{name}: {tuple(entry['shape'])} {entry['dtype']}")
+    print(f"Wrote {len(manifest['arrays'])} arrays to {sys.argv[2]}")
@@ -0,0 +1,174 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class WindowedArray:
+    """
+    Lazy (n_windows, sequence_length, n_features) array over a zero-copy
+    sliding-window view: indexing gathers only the requested windows, so it
+    can stand in for X in player_data.ArrayDataset without materializing
+    every overlapping window.
+    """
+    def __init__(self, windows, starts):
+        self.windows = windows
+        self.starts = starts
+        self.shape = (len(starts),) + windows.shape[1:]
+        self.dtype = windows.dtype
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, idx):
+        return self.windows[self.starts[idx]]
+
+    def __array__(self, dtype=None, copy=None):
+        return materialize(self.windows, self.starts).astype(dtype or self.dtype, copy=False)
+
+
+def _window_starts(groups, sequence_length):
+    # A window starting at i uses rows i .. i+L-1 and predicts row i+L; rows
+    # are sorted by group, so it is valid when rows i and i+L share a group
+    L = sequence_length
+    if len(groups) <= L:
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(groups[:-L] == groups[L:])
+
+
+def materialize(windows, starts, n_jobs=1):
+    """Copy the selected windows into one contiguous array, split across threads."""
+    out = np.empty((len(starts),) + windows.shape[1:], dtype=windows.dtype)
+    if n_jobs <= 1 or len(starts) < 2 * n_jobs:
+        np.take(windows, starts, axis=0, out=out)
+        return out
+    bounds = np.linspace(0, len(starts), n_jobs + 1).astype(int)
+
+    def gather(k):
+        lo, hi = bounds[k], bounds[k + 1]
+        np.take(windows, starts[lo:hi], axis=0, out=out[lo:hi])
+
+    with ThreadPoolExecutor(n_jobs) as pool:
+        list(pool.map(gather, range(n_jobs)))
+    return out
+
+
+def build_sequences(df, feature_cols, target_col='overall_rating', group_col='player_api_id',
+                    sequence_length=3, lazy=False, n_jobs=1):
+    """
+    Vectorized replacement for the per-player loop
+        for each player: X = rows[i : i+L, feature_cols], y = rows[i+L, target_col]
+    Rows are sorted by group once (stable, so each player's rows keep their
+    order, as with groupby) and every window is a strided view of that table.
+
+    Returns X: (samples, sequence_length, features) float32 (a WindowedArray
+    if lazy=True), y: (samples,) float32 and the group id of each sample.
+    n_jobs > 1 splits the gather across threads, each taking a contiguous
+    shard of the player-sorted windows.
+    """
+    groups = df[group_col].to_numpy()
+    order = np.argsort(groups, kind='stable')
+    groups = groups[order]
+    F = np.ascontiguousarray(df[feature_cols].to_numpy(dtype=np.float32)[order])
+    target = df[target_col].to_numpy(dtype=np.float32)[order]
+
+    L = sequence_length
+    starts = _window_starts(groups, L)
+    y = target[starts + L]
+    if len(F) < L:
+        windows = np.empty((0, L, F.shape[1]), dtype=np.float32)
+    else:
+        # (n - L + 1, L, features); no data copied
+        windows = sliding_window_view(F, L, axis=0).transpose(0, 2, 1)
+
+    if lazy:
+        X = WindowedArray(windows, starts)
+    else:
+        X = materialize(windows, starts, n_jobs)
+    return X, y, groups[starts]
+
+
+def build_histories(df, feature_cols, target_col='overall_rating', group_col='player_api_id',
+                    max_length=None, min_length=1):
+    """
+    Variable-length version of build_sequences: every row with at least
+    `min_length` earlier rows of the same group becomes a sample whose history
+    is all of those earlier rows (the last `max_length` if given). Nothing is
+    copied per sample; histories are (start, length) ranges into one sorted
+    feature table, the layout player_data.SequenceDataset reads.
+
+    Returns steps: (rows, features) float32, starts, lengths, y and the
+    group id of each sample.
+    """
+    groups = df[group_col].to_numpy()
+    order = np.argsort(groups, kind='stable')
+    groups = groups[order]
+    steps = np.ascontiguousarray(df[feature_cols].to_numpy(dtype=np.float32)[order])
+    target = df[target_col].to_numpy(dtype=np.float32)[order]
+
+    n = len(groups)
+    rows = np.arange(n)
+    is_first = np.r_[True, groups[1:] != groups[:-1]] if n else np.empty(0, dtype=bool)
+    group_start = np.maximum.accumulate(np.where(is_first, rows, 0)) if n else rows
+    position = rows - group_start                       # earlier rows of the same group
+
+    samples = np.flatnonzero(position >= min_length)
+    lengths = position[samples]
+    if max_length is not None:
+        lengths = np.minimum(lengths, max_length)
+    return steps, samples - lengths, lengths, target[samples], groups[samples]
+
+
+if __name__ == "__main__":
+    # Build the player-rating training set as a memory-mapped dataset:
+    #   python player_sequences.py player_attributes_cleaned.csv player_dataset --sequence-length 3
+    # or with variable-length histories (up to --max-length earlier records):
+    #   python player_sequences.py player_attributes_cleaned.csv player_histories --variable --max-length 10
+    import argparse
+    import time
+    import pandas as pd
+    from player_data import write_dataset
+
+    parser = argparse.ArgumentParser(description="Build (samples, seq_len, features) player windows")
+    parser.add_argument('csv')
+    parser.add_argument('out_dir')
+    parser.add_argument('--sequence-length', type=int, default=3)
+    parser.add_argument('--train-ratio', type=float, default=0.8)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--variable', action='store_true', help="variable-length histories")
+    parser.add_argument('--max-length', type=int, default=None)
+    args = parser.parse_args()
+
+    player_cleaned_df = pd.read_csv(args.csv).drop(columns="date", errors='ignore')
+    feature_cols = [c for c in player_cleaned_df.columns
+                    if c not in ['overall_rating', 'player_api_id'] and
+                    pd.api.types.is_numeric_dtype(player_cleaned_df[c])]
+
+    if args.variable:
+        started = time.perf_counter()
+        steps, starts, lengths, y, _ = build_histories(player_cleaned_df, feature_cols,
+                                                       max_length=args.max_length)
+        print(f"Built {len(starts)} histories (mean length {lengths.mean():.1f}) "
+              f"in {time.perf_counter() - started:.2f}s")
+        n_train = int(len(starts) * args.train_ratio)
+        write_dataset(args.out_dir,
+                      {'steps': steps,
+                       'starts_train': starts[:n_train], 'lengths_train': lengths[:n_train],
+                       'y_train': y[:n_train],
+                       'starts_val': starts[n_train:], 'lengths_val': lengths[n_train:],
+                       'y_val': y[n_train:]},
+                      feature_cols=feature_cols, sequence_length=args.max_length)
+        print(f"Saved dataset to {args.out_dir}")
+        raise SystemExit
+
+    started = time.perf_counter()
+    X, y, _ = build_sequences(player_cleaned_df, feature_cols,
+                              sequence_length=args.sequence_length, n_jobs=args.jobs)
+    print(f"Built {X.shape} windows in {time.perf_counter() - started:.2f}s")
+
+    # Train/val split
+    n_train = int(len(X) * args.train_ratio)
+    write_dataset(args.out_dir,
+                  {'X_train': X[:n_train], 'y_train': y[:n_train],
+                   'X_val': X[n_train:], 'y_val': y[n_train:]},
+                  feature_cols=feature_cols, sequence_length=args.sequence_length)
+    print(f"Saved dataset to {args.out_dir}")
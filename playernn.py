@@ -1,13 +1,16 @@
+import copy
 import torch
 import torch.nn as nn
 import torch.optim as optim
+from torch.nn.utils.rnn import pack_padded_sequence
 import pickle
 import numpy as np
 
 class PlayerRatingLSTM(nn.Module):
     """
     LSTM-based regressor for predicting team goals.
-    Input shape: (batch_size, seq_len=1, input_size)
+    Input shape: (batch_size, seq_len, input_size), optionally with
+    lengths: (batch_size,) for right-padded variable-length histories
     Output: (batch_size, 1)
     """
     def __init__(self, input_size, hidden_size=128, num_layers=2, dropout=0.2):
@@ -23,12 +26,171 @@ class PlayerRatingLSTM(nn.Module):
         )
         self.fc = nn.Linear(hidden_size, 1)
 
-    def forward(self, x):
+    def forward(self, x, lengths=None):
         # x: (batch, seq_len, input_size)
+        if lengths is not None:
+            # Packed: the LSTM skips padding; h_n holds each sequence's true last step
+            packed = pack_padded_sequence(x, lengths.cpu(), batch_first=True, enforce_sorted=False)
+            _, (h_n, _) = self.lstm(packed)   # h_n: (num_layers, batch, hidden_size)
+            return self.fc(h_n[-1])           # (batch, 1)
         out, _ = self.lstm(x)                 # out: (batch, seq_len, hidden_size)
         last_out = out[:, -1, :]              # take output at last time step
         return self.fc(last_out)              # (batch, 1)
 
+    def to_fast_inference(self, verify=True):
+        """
+        Export an inference-only FastPlayerRatingLSTM for seq_len=1 inputs.
+        With verify=True the export is checked against this model's forward
+        and a ValueError is raised if they disagree.
+        """
+        fast = FastPlayerRatingLSTM.from_lstm(self)
+        if verify:
+            err = check_fast_inference(self, fast)
+            if err > 1e-4:
+                raise ValueError(f"Fast inference export differs from the LSTM by {err:.2e}")
+        return fast
+
+
+def fold_input_scaler(model, mean, scale):
+    """
+    Absorb standardization x_s = (x - mean) / scale into the first LSTM layer
+    in place, so the model takes raw features. mean/scale: (input_size,)
+    arrays, e.g. StandardScaler.mean_ and .scale_ (None means 0 / 1).
+    """
+    lstm = model.lstm
+    W = lstm.weight_ih_l0.detach().double()
+    b = lstm.bias_ih_l0.detach().double()
+    if scale is not None:
+        W = W / torch.as_tensor(np.asarray(scale), dtype=torch.float64)
+    if mean is not None:
+        b = b - W @ torch.as_tensor(np.asarray(mean), dtype=torch.float64)
+    with torch.no_grad():
+        lstm.weight_ih_l0.copy_(W)
+        lstm.bias_ih_l0.copy_(b)
+    return model
+
+
+def _fold_lstm_layer(lstm, layer):
+    """
+    For one time step from zero state the recurrent term W_hh @ h0 is zero
+    and the forget gate multiplies c0 = 0, so each layer only needs the
+    input, cell and output gate rows of W_ih and the summed biases.
+    Returns (W, b) with W: (3 * hidden, in) ordered as [i, g, o].
+    """
+    H = lstm.hidden_size
+    W = getattr(lstm, f'weight_ih_l{layer}').detach()
+    b = getattr(lstm, f'bias_ih_l{layer}').detach() + getattr(lstm, f'bias_hh_l{layer}').detach()
+    # PyTorch packs gates as [i, f, g, o]; drop f
+    keep = torch.cat([torch.arange(0, H), torch.arange(2 * H, 4 * H)])
+    return W[keep].clone(), b[keep].clone()
+
+
+class FastPlayerRatingLSTM(nn.Module):
+    """
+    Inference-only equivalent of PlayerRatingLSTM for seq_len=1, zero initial
+    state: each LSTM layer becomes one fused Linear (input, cell, output gates)
+    followed by elementwise activations.
+    Input shape: (batch_size, input_size) or (batch_size, 1, input_size)
+    Output: (batch_size, 1)
+    """
+    def __init__(self, input_size, hidden_size=128, num_layers=2):
+        super(FastPlayerRatingLSTM, self).__init__()
+        self.hidden_size = hidden_size
+        self.layers = nn.ModuleList([
+            nn.Linear(input_size if i == 0 else hidden_size, 3 * hidden_size)
+            for i in range(num_layers)
+        ])
+        self.fc = nn.Linear(hidden_size, 1)
+
+    @classmethod
+    def from_lstm(cls, model):
+        lstm = model.lstm
+        fast = cls(lstm.input_size, lstm.hidden_size, lstm.num_layers)
+        with torch.no_grad():
+            for i, layer in enumerate(fast.layers):
+                W, b = _fold_lstm_layer(lstm, i)
+                layer.weight.copy_(W)
+                layer.bias.copy_(b)
+            fast.fc.load_state_dict(model.fc.state_dict())
+        return fast.eval()
+
+    def forward(self, x):
+        if x.dim() == 3:
+            if x.size(1) != 1:
+                raise ValueError(f"FastPlayerRatingLSTM runs a single time step; got sequences of length "
+                                 f"{x.size(1)}. Use PlayerRatingLSTM for longer histories.")
+            x = x[:, 0, :]
+        h = x
+        for layer in self.layers:
+            i, g, o = layer(h).chunk(3, dim=1)
+            h = torch.sigmoid(o) * torch.tanh(torch.sigmoid(i) * torch.tanh(g))
+        return self.fc(h)
+
+    def to_numpy(self):
+        return NumpyPlayerRatingLSTM(
+            [(l.weight.detach().numpy().T.copy(), l.bias.detach().numpy().copy()) for l in self.layers],
+            (self.fc.weight.detach().numpy().T.copy(), self.fc.bias.detach().numpy().copy()),
+        )
+
+
+class NumpyPlayerRatingLSTM:
+    """
+    Pure-NumPy evaluator for a FastPlayerRatingLSTM export (no torch needed at
+    call time). layers: list of (W (in, 3H), b (3H,)); fc: (W (H, 1), b (1,)).
+    Input shape: (batch_size, input_size) or (batch_size, 1, input_size); output: (batch_size, 1)
+    """
+    def __init__(self, layers, fc):
+        self.layers = layers
+        self.fc = fc
+
+    @staticmethod
+    def _sigmoid(x):
+        return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+    def __call__(self, X):
+        h = np.asarray(X, dtype=np.float32)
+        if h.ndim == 3:
+            if h.shape[1] != 1:
+                raise ValueError(f"NumpyPlayerRatingLSTM runs a single time step; got sequences of length "
+                                 f"{h.shape[1]}. Use PlayerRatingLSTM for longer histories.")
+            h = h[:, 0, :]
+        for W, b in self.layers:
+            i, g, o = np.split(h @ W + b, 3, axis=1)
+            h = self._sigmoid(o) * np.tanh(self._sigmoid(i) * np.tanh(g))
+        W, b = self.fc
+        return h @ W + b
+
+
+def check_fast_inference(model, fast, n_samples=256, seed=0):
+    """Max absolute difference between model and a fast export on random inputs."""
+    gen = torch.Generator().manual_seed(seed)
+    X = torch.randn(n_samples, 1, model.lstm.input_size, generator=gen)
+    was_training = model.training
+    model.eval()
+    with torch.no_grad():
+        ref = model(X)
+        out = fast(X) if isinstance(fast, nn.Module) else torch.from_numpy(fast(X.numpy()))
+    model.train(was_training)
+    return (ref - out).abs().max().item()
+
+
+def quantize_int8(model):
+    """
+    Dynamic int8 copy of a PlayerRatingLSTM for CPU inference: LSTM and fc
+    weights are stored as int8, activations are quantized per batch at run
+    time. The input model is left untouched.
+    """
+    model = copy.deepcopy(model).cpu().eval()
+    return torch.ao.quantization.quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+
+def load_quantized(path, input_size, **kwargs):
+    """Load a quantize_int8 state dict (e.g. player_nn_model_int8.pth)."""
+    model = quantize_int8(PlayerRatingLSTM(input_size=input_size, **kwargs))
+    # Packed int8 weights are pickled ScriptObjects, which weights_only refuses
+    model.load_state_dict(torch.load(path, map_location='cpu', weights_only=False))
+    return model
+
 
 if __name__ == "__main__":
     # ---------------------------
@@ -38,75 +200,246 @@ if __name__ == "__main__":
     #   'X_train': numpy array (n_samples, n_features)
     #   'y_train': numpy array (n_samples,)
     # Optionally, 'X_val', 'y_val' for validation.
-    
+    # --data may also point at a dataset directory (see player_data.py:
+    # .npy arrays + manifest.json), which is memory-mapped instead of loaded.
+    # X may be (n_samples, seq_len, n_features); a variable-length history
+    # dataset (player_sequences.py --variable) is trained with packed batches.
+    #
+    # Throughput options, e.g. on a CPU box:
+    #   python playernn.py --precision bf16 --batch-size 256 --compile
+    # --precision bf16 autocasts to bfloat16 (CPU or CUDA), fp16 is CUDA AMP
+    # with gradient scaling; the learning rate is scaled from BATCH_SIZE to
+    # --batch-size (--lr-scaling). Each epoch reports samples/s and peak memory.
+    #
+    # Training stops early once val loss has not improved for --patience
+    # epochs. A checkpoint (model, optimizer, epoch, best weights, RNG state)
+    # is written atomically every --checkpoint-every epochs; --resume picks an
+    # interrupted run up from it.
+    import argparse
+    import math
+    import os
+    import random
+    import resource
+    import time
+    from player_data import (ArrayDataset, make_loader, load_arrays,
+                             is_history_dataset, load_histories)
+
     # Hyperparameters
     EPOCHS = 50
     BATCH_SIZE = 32
     LEARNING_RATE = 1e-3
+    PATIENCE = 10
     MODEL_PATH = 'player_nn_model_weights.pth'
     DATA_PATH = 'player_model_and_data.pkl'
+    CHECKPOINT_PATH = 'player_nn_checkpoint.pt'
+
+    parser = argparse.ArgumentParser(description="Train PlayerRatingLSTM")
+    parser.add_argument('--data', default=DATA_PATH, help="pickle bundle or .npy directory")
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--lr', type=float, default=LEARNING_RATE)
+    parser.add_argument('--num-workers', type=int, default=0, help="background loader processes")
+    parser.add_argument('--prefetch', type=int, default=2, help="batches prefetched per worker")
+    parser.add_argument('--no-bucket', action='store_true',
+                        help="variable-length data: random batches instead of length buckets")
+    parser.add_argument('--precision', choices=['fp32', 'bf16', 'fp16'], default='fp32',
+                        help="autocast dtype for forward passes (fp16 needs CUDA)")
+    parser.add_argument('--lr-scaling', choices=['none', 'linear', 'sqrt'], default='sqrt',
+                        help=f"scale --lr by --batch-size / {BATCH_SIZE}")
+    parser.add_argument('--compile', action='store_true', help="train a torch.compile'd model")
+    parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads (CPU)")
+    parser.add_argument('--patience', type=int, default=PATIENCE,
+                        help="stop after this many epochs without val improvement (0 = never)")
+    parser.add_argument('--min-delta', type=float, default=0.0, help="smallest val loss drop that counts")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH)
+    parser.add_argument('--checkpoint-every', type=int, default=1,
+                        help="epochs between checkpoints (0 = only at the end or on early stop)")
+    parser.add_argument('--resume', action='store_true', help="continue from --checkpoint")
+    args = parser.parse_args()
+    if args.checkpoint_every < 0:
+        parser.error("--checkpoint-every must be >= 0")
 
     # Device setup
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    pin = device.type == 'cuda'
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if args.precision == 'fp16' and device.type != 'cuda':
+        parser.error("--precision fp16 needs CUDA; use bf16 on CPU")
+    amp_dtype = {'fp32': None, 'bf16': torch.bfloat16, 'fp16': torch.float16}[args.precision]
+    # fp16 gradients can underflow; bf16 has float32's exponent range and needs no scaler
+    grad_scaler = torch.amp.GradScaler(device.type, enabled=args.precision == 'fp16')
+
+    def autocast():
+        return torch.autocast(device.type, dtype=amp_dtype, enabled=amp_dtype is not None)
+
+    def reset_peak_memory():
+        """Start a new peak-memory window; False if only the process-lifetime peak is available."""
+        if device.type == 'cuda':
+            torch.cuda.reset_peak_memory_stats(device)
+            return True
+        try:
+            # Linux: writing 5 resets VmHWM (peak RSS) to the current RSS
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+            return True
+        except OSError:
+            return False
+
+    def peak_memory_mb():
+        if device.type == 'cuda':
+            return torch.cuda.max_memory_allocated(device) / 2**20
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        # Peak RSS of the process so far (kilobytes on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    # Learning rate for the chosen batch size
+    batch_ratio = args.batch_size / BATCH_SIZE
+    lr = args.lr * {'none': 1.0, 'linear': batch_ratio, 'sqrt': math.sqrt(batch_ratio)}[args.lr_scaling]
 
     # Load training (and optional validation) data
-    with open(DATA_PATH, 'rb') as f:
-        data = pickle.load(f)
-    X_train = data['X_train']      # shape: (n_train, n_features)
-    y_train = data['y_train']      # shape: (n_train,)
-    X_val = data.get('X_val', None)
-    y_val = data.get('y_val', None)
-
-    # Convert to torch tensors
-    X_train = torch.tensor(X_train, dtype=torch.float32).unsqueeze(1).to(device)
-    y_train = torch.tensor(y_train, dtype=torch.float32).unsqueeze(1).to(device)
-    if X_val is not None:
-        X_val = torch.tensor(X_val, dtype=torch.float32).unsqueeze(1).to(device)
-        y_val = torch.tensor(y_val, dtype=torch.float32).unsqueeze(1).to(device)
+    variable = os.path.isdir(args.data) and is_history_dataset(args.data)
+    if variable:
+        train_ds, val_ds = load_histories(args.data)
+    else:
+        data = load_arrays(args.data)
+        train_ds = ArrayDataset(data['X_train'], data['y_train'])
+        val_ds = ArrayDataset(data['X_val'], data['y_val']) if data['X_val'] is not None else None
+    bucket = variable and not args.no_bucket
+    train_loader = make_loader(train_ds, args.batch_size, shuffle=True, num_workers=args.num_workers,
+                               pin_memory=pin, prefetch_factor=args.prefetch, bucket=bucket)
+    val_loader = None
+    if val_ds is not None:
+        val_loader = make_loader(val_ds, max(args.batch_size, 1024), num_workers=args.num_workers,
+                                 pin_memory=pin, prefetch_factor=args.prefetch, bucket=bucket)
+
+    def run_batch(batch):
+        # (X, y) for fixed-length data, (X, y, lengths) for padded histories
+        batch_X = batch[0].to(device, non_blocking=pin)
+        batch_y = batch[1].to(device, non_blocking=pin)
+        lengths = batch[2] if len(batch) > 2 else None
+        with autocast():
+            outputs = train_model(batch_X, lengths)
+        # Loss in float32 whatever the forward precision
+        return outputs.float(), batch_y
 
     # Initialize model
-    input_size = X_train.shape[2]
+    input_size = train_ds.n_features
     model = PlayerRatingLSTM(input_size=input_size).to(device)
+    # Compiled wrapper shares model's parameters; model.state_dict() stays unprefixed
+    train_model = torch.compile(model) if args.compile else model
     criterion = nn.MSELoss()
-    optimizer = optim.Adam(model.parameters(), lr=LEARNING_RATE)
+    optimizer = optim.Adam(model.parameters(), lr=lr)
+    print(f"Training on {device} - {args.precision} - batch {args.batch_size} - lr {lr:.2e}"
+          f"{' - compiled' if args.compile else ''}")
+    epoch_rates = []
 
     best_val_loss = float('inf')
     best_state = None
+    stale_epochs = 0
+    start_epoch = 1
+
+    def rng_state():
+        state = {'torch': torch.get_rng_state(), 'numpy': np.random.get_state(), 'python': random.getstate()}
+        if device.type == 'cuda':
+            state['cuda'] = torch.cuda.get_rng_state_all()
+        if bucket:
+            state['bucket'] = train_loader.batch_sampler.rng.bit_generator.state
+        return state
+
+    def set_rng_state(state):
+        torch.set_rng_state(state['torch'])
+        np.random.set_state(state['numpy'])
+        random.setstate(state['python'])
+        if 'cuda' in state and device.type == 'cuda':
+            torch.cuda.set_rng_state_all(state['cuda'])
+        if 'bucket' in state and bucket:
+            train_loader.batch_sampler.rng.bit_generator.state = state['bucket']
+
+    def save_checkpoint(epoch):
+        # Write then rename: an interrupted save never clobbers the last good checkpoint
+        tmp = args.checkpoint + '.tmp'
+        torch.save({'epoch': epoch, 'model': model.state_dict(), 'optimizer': optimizer.state_dict(),
+                    'grad_scaler': grad_scaler.state_dict(), 'best_val_loss': best_val_loss,
+                    'best_state': best_state, 'stale_epochs': stale_epochs, 'rng': rng_state()}, tmp)
+        os.replace(tmp, args.checkpoint)
+
+    if args.resume:
+        checkpoint = torch.load(args.checkpoint, map_location=device, weights_only=False)
+        model.load_state_dict(checkpoint['model'])
+        optimizer.load_state_dict(checkpoint['optimizer'])
+        grad_scaler.load_state_dict(checkpoint['grad_scaler'])
+        best_val_loss = checkpoint['best_val_loss']
+        best_state = checkpoint['best_state']
+        stale_epochs = checkpoint['stale_epochs']
+        set_rng_state(checkpoint['rng'])
+        start_epoch = checkpoint['epoch'] + 1
+        print(f"Resumed from {args.checkpoint} after epoch {checkpoint['epoch']} "
+              f"(best val loss {best_val_loss:.4f})")
 
     # Training loop
-    for epoch in range(1, EPOCHS + 1):
+    for epoch in range(start_epoch, args.epochs + 1):
         model.train()
-        perm = torch.randperm(X_train.size(0))
-        train_loss = 0.0
-        for i in range(0, len(perm), BATCH_SIZE):
-            idx = perm[i:i + BATCH_SIZE]
-            batch_X = X_train[idx]
-            batch_y = y_train[idx]
-
+        epoch_peak = reset_peak_memory()
+        started = time.perf_counter()
+        # Accumulate on the device; one host sync per epoch instead of per step
+        train_loss = torch.zeros((), device=device)
+        for batch in train_loader:
             optimizer.zero_grad()
-            outputs = model(batch_X)
+            outputs, batch_y = run_batch(batch)
             loss = criterion(outputs, batch_y)
-            loss.backward()
-            optimizer.step()
-            train_loss += loss.item() * batch_X.size(0)
+            grad_scaler.scale(loss).backward()
+            grad_scaler.step(optimizer)
+            grad_scaler.update()
+            train_loss += loss.detach() * batch_y.size(0)
 
-        train_loss /= X_train.size(0)
+        train_loss = train_loss.item() / len(train_ds)
+        samples_per_sec = len(train_ds) / (time.perf_counter() - started)
+        epoch_rates.append(samples_per_sec)
 
         # Validation
-        if X_val is not None:
+        if val_loader is not None:
             model.eval()
+            val_loss = torch.zeros((), device=device)
             with torch.no_grad():
-                val_out = model(X_val)
-                val_loss = criterion(val_out, y_val).item()
+                for batch in val_loader:
+                    outputs, batch_y = run_batch(batch)
+                    val_loss += criterion(outputs, batch_y) * batch_y.size(0)
+            val_loss = val_loss.item() / len(val_ds)
         else:
             val_loss = train_loss
 
-        print(f"Epoch {epoch}/{EPOCHS} - train loss: {train_loss:.4f} - val loss: {val_loss:.4f}")
+        print(f"Epoch {epoch}/{args.epochs} - train loss: {train_loss:.4f} - val loss: {val_loss:.4f}"
+              f" - {samples_per_sec:,.0f} samples/s - {'peak' if epoch_peak else 'process peak'} mem"
+              f" {peak_memory_mb():,.0f} MB")
 
-        # Save best model
-        if val_loss < best_val_loss:
+        # Save best model; state_dict() holds the live tensors, so copy them
+        if val_loss < best_val_loss - args.min_delta:
             best_val_loss = val_loss
-            best_state = model.state_dict()
+            best_state = copy.deepcopy(model.state_dict())
+            stale_epochs = 0
+        else:
+            stale_epochs += 1
+
+        stop = args.patience > 0 and stale_epochs >= args.patience
+        periodic = args.checkpoint_every > 0 and epoch % args.checkpoint_every == 0
+        if stop or periodic or epoch == args.epochs:
+            save_checkpoint(epoch)
+        if stop:
+            print(f"Early stopping: no val improvement for {stale_epochs} epochs")
+            break
+
+    # First epoch includes compilation and warm-up; leave it out when there are others
+    steady = epoch_rates[1:] or epoch_rates
+    if steady:
+        print(f"Throughput: {sum(steady) / len(steady):,.0f} samples/s "
+              f"({args.precision}, batch {args.batch_size}{', compiled' if args.compile else ''})")
 
     # Write out best model weights
     if best_state is not None:
@@ -118,9 +451,11 @@ if __name__ == "__main__":
 
     # Ensure training features are saved for scaler building
     # Overwrites player_data.pkl to contain only X_train for scaler
-    with open('player_data.pkl', 'wb') as f:
-        pickle.dump({'X_train': data['X_train']}, f)
-        print("Saved X_train for scaler in 'player_data.pkl'.")
+    # (a .npy directory already has X_train.npy on disk)
+    if not variable and not os.path.isdir(args.data):
+        with open('player_data.pkl', 'wb') as f:
+            pickle.dump({'X_train': data['X_train']}, f)
+            print("Saved X_train for scaler in 'player_data.pkl'.")
 
 #lines below are old code
 
@@ -0,0 +1,6 @@
+import os
+
+
+def file_version(*paths):
+    """Cheap identity for artifact files: name, size and mtime of each"""
+    return '|'.join(f"{p}:{os.path.getsize(p)}:{os.path.getmtime(p)}" for p in paths)
@@ -0,0 +1,121 @@
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+
+class _Pending:
+    def __init__(self, X):
+        self.X = X
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent predict calls into one batched forward pass.
+    A single worker thread owns the model: it takes the first waiting request,
+    keeps collecting more until `max_rows` rows are queued or `max_wait_ms`
+    has passed, runs `fn` once on the stacked rows and hands each caller back
+    its own slice. A request that would take the batch past `max_rows` starts
+    the next batch instead, so requests larger than `max_rows` run alone. If
+    a batch of several requests fails, each is rerun alone, so an error only
+    reaches the caller whose rows caused it.
+    Threads do not survive fork(), so a forked worker process gets its own
+    queue and worker thread.
+    """
+    def __init__(self, fn, max_rows=256, max_wait_ms=2.0):
+        self.fn = fn
+        self.max_rows = max_rows
+        self.max_wait = max_wait_ms / 1000.0
+        self._stats = dict(batches=0, requests=0, rows=0, max_batch_rows=0,
+                           queue_wait_s=0.0, max_queue_wait_s=0.0)
+        self._start()
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue = queue.Queue()
+        self._held = None   # request that did not fit the last batch
+        self._stats_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, X):
+        """Run fn on X (n, features) through the shared queue; blocks until done."""
+        p = _Pending(X)
+        self._queue.put(p)
+        p.done.wait()
+        if p.error is not None:
+            raise p.error
+        return p.result
+
+    def stats(self):
+        with self._stats_lock:
+            s = dict(self._stats)
+        batches, requests = s['batches'], s['requests']
+        s['mean_batch_rows'] = s['rows'] / batches if batches else 0.0
+        s['mean_requests_per_batch'] = requests / batches if batches else 0.0
+        queue_wait_s = s.pop('queue_wait_s')
+        s['mean_queue_wait_ms'] = 1000.0 * queue_wait_s / requests if requests else 0.0
+        s['max_queue_wait_ms'] = 1000.0 * s.pop('max_queue_wait_s')
+        return s
+
+    def _collect(self):
+        first, self._held = self._held or self._queue.get(), None
+        batch = [first]
+        rows = len(first.X)
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_rows:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                p = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if rows + len(p.X) > self.max_rows:
+                self._held = p
+                break
+            batch.append(p)
+            rows += len(p.X)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self._forward(batch)
+            self._record(batch, started)
+            for p in batch:
+                p.done.set()
+
+    def _forward(self, batch):
+        try:
+            X = batch[0].X if len(batch) == 1 else np.concatenate([p.X for p in batch])
+            out = self.fn(X)
+            offset = 0
+            for p in batch:
+                n = len(p.X)
+                p.result = out[offset:offset + n]
+                offset += n
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].error = e
+                return
+            for p in batch:
+                self._forward([p])
+
+    def _record(self, batch, started):
+        waits = [started - p.enqueued for p in batch]
+        rows = sum(len(p.X) for p in batch)
+        with self._stats_lock:
+            s = self._stats
+            s['batches'] += 1
+            s['requests'] += len(batch)
+            s['rows'] += rows
+            s['max_batch_rows'] = max(s['max_batch_rows'], rows)
+            s['queue_wait_s'] += sum(waits)
+            s['max_queue_wait_s'] = max(s['max_queue_wait_s'], max(waits))
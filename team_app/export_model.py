@@ -0,0 +1,50 @@
+# export_model.py
+#
+#   python export_model.py        # -> player_nn_model_scripted.pt, served with INFERENCE_MODE=scripted
+#
+# Writes a self-contained TorchScript model for the seq_len=1 /predict path:
+# the scaler is folded into the first layer, the LSTM is folded into dense
+# layers (FastPlayerRatingLSTM) and the result is scripted and frozen, so
+# loading it needs neither playernn.py nor sklearn.
+
+import json
+import joblib
+import torch
+from playernn import PlayerRatingLSTM, fold_input_scaler
+from artifacts import file_version
+
+INPUT_SIZE     = 40
+MODEL_WEIGHTS  = 'player_nn_model_weights.pth'
+SCALER_PATH    = 'scaler.pkl'
+SCRIPTED_MODEL = 'player_nn_model_scripted.pt'
+
+# 1) Load the trained weights and the fitted scaler the server would use:
+model = PlayerRatingLSTM(input_size=INPUT_SIZE)
+model.load_state_dict(torch.load(MODEL_WEIGHTS, map_location='cpu'))
+model.eval()
+scaler = joblib.load(SCALER_PATH)
+
+# 2) Fold the scaler in, then the single-step LSTM, and freeze the scripted module:
+fold_input_scaler(model, scaler.mean_, scaler.scale_)
+fast = model.to_fast_inference()
+frozen = torch.jit.freeze(torch.jit.script(fast))
+
+# 3) Check the export on raw inputs against scaler.transform + the original model:
+X = torch.randn(256, INPUT_SIZE, dtype=torch.float64) * torch.as_tensor(scaler.scale_) + torch.as_tensor(scaler.mean_)
+reference = PlayerRatingLSTM(input_size=INPUT_SIZE)
+reference.load_state_dict(torch.load(MODEL_WEIGHTS, map_location='cpu'))
+reference.eval()
+with torch.no_grad():
+    Xs = torch.tensor(scaler.transform(X.numpy()), dtype=torch.float32).unsqueeze(1)
+    err = (frozen(X.float().unsqueeze(1)) - reference(Xs)).abs().max().item()
+if err > 1e-3:
+    raise SystemExit(f"Scripted model differs from scaler + model by {err:.2e}; not saved")
+
+# 4) Save with the metadata the server reads back (feature order, source files):
+feature_cols = getattr(scaler, 'feature_names_in_', None)
+extra = {
+    'feature_cols.json': json.dumps(list(feature_cols) if feature_cols is not None else None),
+    'source.txt': file_version(MODEL_WEIGHTS, SCALER_PATH),
+}
+torch.jit.save(frozen, SCRIPTED_MODEL, _extra_files=extra)
+print(f"Exported {MODEL_WEIGHTS} + {SCALER_PATH} (max abs diff {err:.2e}) → saved {SCRIPTED_MODEL}")
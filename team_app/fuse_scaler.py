@@ -0,0 +1,33 @@
+# fuse_scaler.py
+
+import joblib
+import torch
+from playernn import PlayerRatingLSTM, fold_input_scaler
+
+INPUT_SIZE    = 40
+MODEL_WEIGHTS = 'player_nn_model_weights.pth'
+SCALER_PATH   = 'scaler.pkl'
+FUSED_WEIGHTS = 'player_nn_model_fused.pth'
+
+# 1) Load the trained weights and the fitted scaler the server would use:
+model = PlayerRatingLSTM(input_size=INPUT_SIZE)
+model.load_state_dict(torch.load(MODEL_WEIGHTS, map_location='cpu'))
+model.eval()
+scaler = joblib.load(SCALER_PATH)
+
+# 2) Fold (x - mean_) / scale_ into the first LSTM layer's input weights and bias:
+fold_input_scaler(model, scaler.mean_, scaler.scale_)
+
+# 3) Check the fused model on raw inputs against scaler.transform + original model:
+X = torch.randn(256, INPUT_SIZE, dtype=torch.float64) * torch.as_tensor(scaler.scale_) + torch.as_tensor(scaler.mean_)
+reference = PlayerRatingLSTM(input_size=INPUT_SIZE)
+reference.load_state_dict(torch.load(MODEL_WEIGHTS, map_location='cpu'))
+reference.eval()
+with torch.no_grad():
+    Xs = torch.tensor(scaler.transform(X.numpy()), dtype=torch.float32).unsqueeze(1)
+    err = (model(X.float().unsqueeze(1)) - reference(Xs)).abs().max().item()
+if err > 1e-3:
+    raise SystemExit(f"Fused model differs from scaler + model by {err:.2e}; not saved")
+
+torch.save(model.state_dict(), FUSED_WEIGHTS)
+print(f"Folded {SCALER_PATH} into {MODEL_WEIGHTS} (max abs diff {err:.2e}) → saved {FUSED_WEIGHTS}")
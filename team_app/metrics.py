@@ -0,0 +1,127 @@
+import threading
+import time
+from contextlib import contextmanager
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROWS_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+def _num(x):
+    return '+Inf' if x == float('inf') else repr(float(x)) if isinstance(x, float) else str(x)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram per label set, rendered in the Prometheus
+    text format (<name>_bucket{le=...}, <name>_sum, <name>_count).
+    """
+    def __init__(self, name, help, labelnames=(), buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._series = {}        # label values -> [bucket counts..., sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _labels(self.labelnames + ('le',), labels + (_num(bound),))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+        return lines
+
+
+# Metrics are per process: under serve.py every worker keeps its own, so
+# scrape each worker (or sum over them) rather than one port.
+STAGE_SECONDS = Histogram('team_app_stage_seconds', "Time spent in each processing stage", ['stage'])
+STAGE_ERRORS = Counter('team_app_stage_errors_total', "Stages that raised", ['stage'])
+REQUEST_SECONDS = Histogram('team_app_request_seconds', "Request handling time by route", ['route'])
+REQUEST_ROWS = Histogram('team_app_request_rows', "Feature rows per request by route", ['route'],
+                         buckets=ROWS_BUCKETS)
+REQUESTS = Counter('team_app_requests_total', "Requests by route and status code", ['route', 'status'])
+REQUEST_ERRORS = Counter('team_app_request_errors_total', "Requests answered with a 4xx/5xx status", ['route'])
+STREAM_ERRORS = Counter('team_app_stream_errors_total', "Streamed responses ended early by an error", ['route'])
+OVERLOAD_REJECTIONS = Counter('team_app_overload_rejections_total', "Requests refused with 503 by serve_async.py")
+REGISTRY = [STAGE_SECONDS, STAGE_ERRORS, REQUEST_SECONDS, REQUEST_ROWS, REQUESTS, REQUEST_ERRORS,
+            STREAM_ERRORS, OVERLOAD_REJECTIONS]
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block into team_app_stage_seconds{stage=name}."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(name)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, name)
+
+
+def gauge_lines(prefix, stats, help="Current value"):
+    """Numeric entries of a stats() dict as Prometheus gauges named <prefix>_<key>."""
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        name = f"{prefix}_{key}"
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {_num(value)}"]
+    return lines
+
+
+def render(extra_lines=()):
+    """Prometheus text exposition (format 0.0.4) of every registered metric."""
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    lines += extra_lines
+    return '\n'.join(lines) + '\n'
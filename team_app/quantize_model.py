@@ -0,0 +1,99 @@
+# quantize_model.py
+#
+#   python quantize_model.py              # player_nn_model_weights.pth -> player_nn_model_int8.pth
+#   python quantize_model.py --fused      # player_nn_model_fused.pth  -> player_nn_model_fused_int8.pth
+#
+# Writes a dynamic int8 copy of the model (LSTM + fc) and reports its
+# accuracy and latency against the float model on the held-out split.
+
+import argparse
+import json
+import os
+import time
+import joblib
+import numpy as np
+import torch
+from playernn import PlayerRatingLSTM, quantize_int8
+from player_data import load_arrays
+
+INPUT_SIZE    = 40
+MODEL_WEIGHTS = 'player_nn_model_weights.pth'
+FUSED_WEIGHTS = 'player_nn_model_fused.pth'
+INT8_WEIGHTS  = 'player_nn_model_int8.pth'
+FUSED_INT8_WEIGHTS = 'player_nn_model_fused_int8.pth'
+SCALER_PATH   = 'scaler.pkl'
+DATA_PATH     = 'player_model_and_data.pkl'   # or a dataset directory
+BATCH_SIZES   = (1, 64, 1024)
+
+
+def latency_ms(model, X, repeat):
+    with torch.no_grad():
+        model(X)                                   # warm-up
+        started = time.perf_counter()
+        for _ in range(repeat):
+            model(X)
+    return 1000.0 * (time.perf_counter() - started) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dynamic int8 quantization of PlayerRatingLSTM")
+    parser.add_argument('--fused', action='store_true', help="quantize the scaler-fused weights")
+    parser.add_argument('--data', default=DATA_PATH, help="held-out X_val / y_val source")
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--report', default=None, help="also write the report as JSON here")
+    args = parser.parse_args()
+    weights, out_path = (FUSED_WEIGHTS, FUSED_INT8_WEIGHTS) if args.fused else (MODEL_WEIGHTS, INT8_WEIGHTS)
+
+    # 1) Load the float model and quantize it:
+    model = PlayerRatingLSTM(input_size=INPUT_SIZE)
+    model.load_state_dict(torch.load(weights, map_location='cpu'))
+    model.eval()
+    qmodel = quantize_int8(model)
+    torch.save(qmodel.state_dict(), out_path)
+
+    # 2) Held-out set, preprocessed as the server would (no scaler when fused):
+    data = load_arrays(args.data)
+    X_val, y_val = data['X_val'], data['y_val']
+    if X_val is None:
+        raise SystemExit(f"{args.data} has no X_val / y_val to evaluate on")
+    X_val = np.asarray(X_val, dtype=np.float32)
+    shape = X_val.shape if X_val.ndim == 3 else (len(X_val), 1, X_val.shape[-1])
+    X_val = X_val.reshape(-1, shape[-1])
+    if not args.fused:
+        X_val = joblib.load(SCALER_PATH).transform(X_val)
+    X = torch.as_tensor(X_val, dtype=torch.float32).reshape(shape)
+    y = np.asarray(y_val, dtype=np.float32).reshape(-1)
+
+    # 3) Accuracy: both models against the targets, and against each other:
+    with torch.no_grad():
+        ref = model(X).reshape(-1).numpy()
+        quant = qmodel(X).reshape(-1).numpy()
+    report = {
+        'weights': weights, 'int8': out_path, 'samples': len(y),
+        'size_bytes': {'float': os.path.getsize(weights), 'int8': os.path.getsize(out_path)},
+        'mse': {'float': float(np.mean((ref - y) ** 2)), 'int8': float(np.mean((quant - y) ** 2))},
+        'mae': {'float': float(np.mean(np.abs(ref - y))), 'int8': float(np.mean(np.abs(quant - y)))},
+        'max_abs_diff': float(np.max(np.abs(ref - quant))) if len(y) else 0.0,
+        'rounded_goals_agree': float(np.mean(np.rint(ref) == np.rint(quant))) if len(y) else 1.0,
+        'latency_ms': {},
+    }
+
+    # 4) Latency per batch size, with the server's default fused float path for reference:
+    fast = model.to_fast_inference()
+    for b in BATCH_SIZES:
+        Xb = X[np.arange(b) % len(X)] if len(X) else torch.zeros(b, *shape[1:])
+        report['latency_ms'][b] = {name: latency_ms(m, Xb, args.repeat)
+                                   for name, m in (('float', model), ('int8', qmodel), ('fast_float', fast))}
+
+    print(f"Quantized {weights} → saved {out_path} "
+          f"({report['size_bytes']['float'] / 1024:.0f} KB → {report['size_bytes']['int8'] / 1024:.0f} KB)")
+    print(f"Held-out ({len(y)} samples): MSE float {report['mse']['float']:.4f} / int8 {report['mse']['int8']:.4f}, "
+          f"MAE float {report['mae']['float']:.4f} / int8 {report['mae']['int8']:.4f}")
+    print(f"int8 vs float: max abs diff {report['max_abs_diff']:.4f}, "
+          f"rounded goals agree on {100 * report['rounded_goals_agree']:.2f}%")
+    print(f"{'batch':>6}{'float ms':>12}{'int8 ms':>12}{'fast_float ms':>15}")
+    for b, t in report['latency_ms'].items():
+        print(f"{b:>6}{t['float']:>12.3f}{t['int8']:>12.3f}{t['fast_float']:>15.3f}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -1,26 +1,135 @@
 # build_scaler.py
+#
+#   python scaler.py                      # fit on the full training data, streamed in chunks
+#   python scaler.py --workers 4          # ... with chunks reduced in parallel
+#   python scaler.py --update new.npy     # fold new rows into the existing scaler.pkl
+#   python scaler.py --in-memory          # old behaviour: StandardScaler().fit on everything
 
+import argparse
+import os
 import pickle
+from concurrent.futures import ThreadPoolExecutor
 import joblib
 import numpy as np
 from sklearn.preprocessing import StandardScaler
+from player_data import open_dataset
 
-# 1) Load the same data bundle you use in your Flask app:
-with open("player_model_and_data.pkl", "rb") as f:
-    data = pickle.load(f)
-
-# 2) Extract X_tensor and convert to NumPy 2D array of shape (n_samples, n_features):
-X_tensor = data["X_tensor"]  # torch.Tensor or something similar
-# If it's a PyTorch tensor:
-try:
-    X_np = X_tensor.squeeze(1).numpy()
-except AttributeError:
-    # If X_tensor is a list of tensors:
-    import torch
-    X_np = torch.stack(X_tensor).squeeze(1).numpy()
-
-# 3) Fit and dump the scaler:
-scaler = StandardScaler().fit(X_np)
-joblib.dump(scaler, "scaler.pkl")
-
-print(f"Fitted scaler on data with shape {X_np.shape} → saved scaler.pkl")
+DATA_PATH   = "player_model_and_data.pkl"
+DATASET_DIR = "player_dataset"   # from: python player_data.py player_model_and_data.pkl player_dataset
+SCALER_PATH = "scaler.pkl"
+
+
+def load_features(path=None):
+    """
+    Feature rows as a 2-D (n_samples, n_features) array. Prefers the
+    memory-mapped dataset directory (no multi-GB unpickle), so rows are only
+    read from disk as chunks are visited; falls back to the pickle bundle.
+    `path` may also be a single .npy file or another dataset directory.
+    """
+    if path is not None and path.endswith('.npy'):
+        X_tensor = np.load(path, mmap_mode='r')
+    elif os.path.isdir(path or DATASET_DIR):
+        arrays, manifest = open_dataset(path or DATASET_DIR)
+        X_tensor = arrays["X_tensor"] if "X_tensor" in arrays else arrays["X_train"]
+    else:
+        with open(path or DATA_PATH, "rb") as f:
+            data = pickle.load(f)
+        X_tensor = data["X_tensor"]  # torch.Tensor or something similar
+
+    # If it's a NumPy array / memmap, flatten any sequence dimension (a view, no copy):
+    if isinstance(X_tensor, np.ndarray):
+        return X_tensor.reshape(-1, X_tensor.shape[-1])
+    # If it's a PyTorch tensor:
+    try:
+        return X_tensor.squeeze(1).numpy()
+    except AttributeError:
+        # If X_tensor is a list of tensors:
+        import torch
+        return torch.stack(X_tensor).squeeze(1).numpy()
+
+
+# Running moments are (n, mean, M2) with M2 = sum of squared deviations,
+# all float64, so chunks can be reduced independently and merged exactly.
+
+def chunk_moments(X):
+    X = np.asarray(X, dtype=np.float64)
+    mean = X.mean(axis=0)
+    return len(X), mean, ((X - mean) ** 2).sum(axis=0)
+
+
+def merge_moments(a, b):
+    """Combine two (n, mean, M2) summaries (Chan et al. parallel update)."""
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    if n_a == 0:
+        return b
+    if n_b == 0:
+        return a
+    delta = mean_b - mean_a
+    mean = mean_a + delta * (n_b / n)
+    m2 = m2_a + m2_b + delta ** 2 * (n_a * n_b / n)
+    return n, mean, m2
+
+
+def streaming_moments(X, chunk_rows=100_000, workers=1):
+    """Moments of X visited `chunk_rows` rows at a time; only one chunk per worker is in memory."""
+    starts = range(0, len(X), chunk_rows)
+    chunks = (X[s:s + chunk_rows] for s in starts)
+    total = (0, np.zeros(X.shape[1]), np.zeros(X.shape[1]))
+    if workers > 1:
+        # NumPy releases the GIL in the reductions, so threads run chunks in parallel
+        with ThreadPoolExecutor(workers) as pool:
+            for m in pool.map(chunk_moments, chunks):
+                total = merge_moments(total, m)
+    else:
+        for chunk in chunks:
+            total = merge_moments(total, chunk_moments(chunk))
+    return total
+
+
+def scaler_moments(scaler):
+    return scaler.n_samples_seen_, scaler.mean_, scaler.var_ * scaler.n_samples_seen_
+
+
+def scaler_from_moments(moments):
+    """A fitted StandardScaler equivalent to StandardScaler().fit on the summarized rows."""
+    n, mean, m2 = moments
+    var = m2 / n
+    scaler = StandardScaler()
+    scaler.n_samples_seen_ = int(n)
+    scaler.n_features_in_ = len(mean)
+    scaler.mean_ = mean
+    scaler.var_ = var
+    # Same as sklearn: constant features are left unscaled
+    scale = np.sqrt(var)
+    scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+    scaler.scale_ = scale
+    return scaler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit the StandardScaler used by the team app")
+    parser.add_argument('--data', default=None, help="dataset dir, .npy file or pickle bundle")
+    parser.add_argument('--chunk-rows', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--update', metavar='NEW_DATA', default=None,
+                        help="refresh the existing scaler.pkl with these rows instead of refitting")
+    parser.add_argument('--in-memory', action='store_true', help="fit with StandardScaler().fit on all rows")
+    args = parser.parse_args()
+
+    # 1) Load the same data you use in your Flask app (or only the new rows for --update):
+    X_np = load_features(args.update or args.data)
+
+    # 2) Fit (or refresh) and dump the scaler:
+    if args.in_memory:
+        scaler = StandardScaler().fit(X_np)
+    else:
+        moments = streaming_moments(X_np, args.chunk_rows, args.workers)
+        if args.update:
+            moments = merge_moments(scaler_moments(joblib.load(SCALER_PATH)), moments)
+        scaler = scaler_from_moments(moments)
+    joblib.dump(scaler, SCALER_PATH)
+
+    print(f"Fitted scaler on data with shape {X_np.shape} → saved {SCALER_PATH} "
+          f"({scaler.n_samples_seen_} samples seen)")
@@ -0,0 +1,261 @@
+# season_table.py
+#
+# Precomputed team/season predictions: every match of team.pkl from both
+# teams' point of view, with predicted scores, outcomes and points, in one
+# SQLite file the server answers team queries from.
+#
+#   python season_table.py                 # build season_predictions.sqlite
+#   python season_table.py --fused         # use player_nn_model_fused.pth (no scaler)
+#
+# The server only answers from a table built by the model it serves: a table
+# built here is used under INFERENCE_MODE=fused (the default), and other
+# modes rebuild it with their own model.
+
+import fcntl
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import joblib
+import numpy as np
+import pandas as pd
+import torch
+from playernn import PlayerRatingLSTM
+from team_features import match_features, outcomes
+from artifacts import file_version
+
+INPUT_SIZE     = 40
+MODEL_WEIGHTS  = 'player_nn_model_weights.pth'
+SCALER_PATH    = 'scaler.pkl'
+FUSED_WEIGHTS  = 'player_nn_model_fused.pth'
+TEAM_DATA_PATH = 'team.pkl'
+TABLE_PATH     = 'season_predictions.sqlite'
+
+# Same columns as the table server.team_season_result builds live
+COLUMNS = ['team_id', 'season', 'date', 'Opponent', 'Venue',
+           'Actual_Team_Goals', 'Actual_Opponent_Goals',
+           'Predicted_Team_Goals', 'Predicted_Opponent_Goals',
+           'Actual_Outcome', 'Predicted_Outcome', 'Actual_Points', 'Predicted_Points']
+
+
+def load_predictor(weights=MODEL_WEIGHTS, scaler_path=SCALER_PATH, input_size=INPUT_SIZE):
+    """Fresh model from disk -> fn(raw rows (n, input_size)) -> (n,) predictions"""
+    model = PlayerRatingLSTM(input_size=input_size)
+    model.load_state_dict(torch.load(weights, map_location='cpu'))
+    model.eval()
+    model = model.to_fast_inference()
+    scaler = joblib.load(scaler_path) if scaler_path else None
+
+    def predict(X):
+        if scaler is not None:
+            X = scaler.transform(X)
+        with torch.no_grad():
+            return model(torch.as_tensor(X, dtype=torch.float32).unsqueeze(1)).reshape(-1).numpy()
+    return predict
+
+
+def season_rows(team_data, feature_cols, predict):
+    """One row per (match, team): both sides of every match, one forward pass"""
+    match_df = team_data.match_df
+    X_home, X_away, home_goals, away_goals = match_features(match_df, feature_cols)
+    preds = np.rint(predict(np.vstack([X_home, X_away]))).astype(int)
+    n = len(match_df)
+    pred_home, pred_away = preds[:n], preds[n:]
+
+    home_ids = match_df['home_team_api_id'].to_numpy()
+    away_ids = match_df['away_team_api_id'].to_numpy()
+    names = team_data.team_names_by_id
+    timestamps = pd.to_datetime(match_df['date'])
+    dates = timestamps.dt.strftime('%Y-%m-%d').to_numpy()
+    seasons = match_df['season'].to_numpy() if 'season' in match_df else np.full(n, '')
+
+    rows = pd.DataFrame({
+        'team_id': np.r_[home_ids, away_ids],
+        'season': np.r_[seasons, seasons],
+        'date': np.r_[dates, dates],
+        'Opponent': [names.get(t) for t in np.r_[away_ids, home_ids]],
+        'Venue': np.repeat(['Home', 'Away'], n),
+        'Actual_Team_Goals': np.r_[home_goals, away_goals],
+        'Actual_Opponent_Goals': np.r_[away_goals, home_goals],
+        'Predicted_Team_Goals': np.r_[pred_home, pred_away],
+        'Predicted_Opponent_Goals': np.r_[pred_away, pred_home],
+    })
+    rows['Actual_Outcome'], rows['Actual_Points'] = outcomes(rows['Actual_Team_Goals'], rows['Actual_Opponent_Goals'])
+    rows['Predicted_Outcome'], rows['Predicted_Points'] = outcomes(rows['Predicted_Team_Goals'], rows['Predicted_Opponent_Goals'])
+    # Stored grouped by team and in kickoff order (ties in match_df order, as
+    # TeamData.team_matches gives them), so queries read by rowid; the stored
+    # date is only the day, so sort on the full timestamp
+    match_pos = np.r_[np.arange(n), np.arange(n)]
+    kickoff = np.r_[timestamps.to_numpy(), timestamps.to_numpy()]
+    order = np.lexsort((match_pos, kickoff, rows['team_id'].to_numpy()))
+    return rows.iloc[order][COLUMNS].reset_index(drop=True)
+
+
+def write_table(path, rows, version):
+    """Write rows + version into a fresh SQLite file, then swap it in atomically"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    with sqlite3.connect(tmp) as con:
+        rows.to_sql('matches', con, index=False)
+        con.execute('CREATE INDEX matches_team_date ON matches (team_id, date)')
+        con.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+        con.execute("INSERT INTO meta VALUES ('version', ?)", (version,))
+    con.close()
+    os.replace(tmp, path)
+
+
+def table_version(path):
+    """Source version recorded in the table, or None if there is no usable table"""
+    try:
+        con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            return con.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        finally:
+            con.close()
+    except (sqlite3.Error, TypeError):
+        return None
+
+
+class SeasonTable:
+    """
+    Read side of the precomputed table, kept fresh in the background.
+    `version()` names what the table should have been built from (the served
+    model and the team.pkl snapshot). A thread re-checks it every
+    `check_interval` seconds; when it differs from the version recorded in the
+    table it calls rebuild(path, version) (at most one process at a time, via
+    a lock file). Until the table matches, query() returns None and the
+    caller falls back to computing the answer live.
+    The thread starts on the first query() in each process, not at import:
+    serve.py forks after `import server`, and a fork in the middle of a
+    rebuild would copy a thread that is inside torch/pandas and holding the
+    lock into every worker.
+    """
+    def __init__(self, path, version, rebuild, check_interval=30.0):
+        self.path = path
+        self.version = version
+        self.rebuild = rebuild
+        self.check_interval = check_interval
+        self.fresh = False
+        self.rebuilds = 0
+        self.last_error = None
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+        self._lock_fd = None   # rebuild lock, while held
+        self._check()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _ensure_worker(self):
+        if self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker_pid != os.getpid():
+                self._worker_pid = os.getpid()
+                threading.Thread(target=self._run, name='season-table', daemon=True).start()
+
+    def _after_fork(self):
+        self._start_lock = threading.Lock()
+        # flock is held until every copy of the descriptor is closed; drop the
+        # child's copy so the lock ends with the parent's rebuild
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _run(self):
+        while True:
+            self._check(rebuild=True)
+            time.sleep(self.check_interval)
+
+    def _check(self, rebuild=False):
+        try:
+            version = self.version()
+        except OSError:
+            self.fresh = False
+            return
+        if table_version(self.path) == version:
+            self.fresh = True
+            return
+        self.fresh = False
+        if not rebuild:
+            return
+        fd = os.open(self.path + '.lock', os.O_WRONLY | os.O_CREAT | os.O_CLOEXEC, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return   # another worker is rebuilding
+            self._lock_fd = fd
+            if table_version(self.path) == version:
+                self.fresh = True
+                return
+            try:
+                self.rebuild(self.path, version)
+                self.rebuilds += 1
+                self.last_error = None
+                self.fresh = table_version(self.path) == version
+            except Exception as e:
+                self.last_error = repr(e)
+        finally:
+            self._lock_fd = None
+            os.close(fd)
+
+    def query(self, team_id, start=None, end=None):
+        """
+        Rows for team_id dated start .. end (inclusive, whole days; empty
+        bounds are open) in date order, or None if the table is not current.
+        """
+        self._ensure_worker()
+        if not self.fresh:
+            return None
+        sql = 'SELECT * FROM matches WHERE team_id = ?'
+        params = [int(team_id)]
+        if start:
+            sql += ' AND date >= ?'
+            params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+        if end:
+            sql += ' AND date <= ?'
+            params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+        sql += ' ORDER BY date, rowid'
+        con = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            return pd.read_sql_query(sql, con, params=params)
+        finally:
+            con.close()
+
+    def stats(self):
+        return dict(fresh=self.fresh, rebuilds=self.rebuilds, last_error=self.last_error)
+
+
+if __name__ == "__main__":
+    import argparse
+    from team_store import TeamData
+
+    parser = argparse.ArgumentParser(description="Precompute team/season predictions")
+    parser.add_argument('--fused', action='store_true', help="use the scaler-fused weights")
+    parser.add_argument('--features', default='attributes.txt', help="model input columns, one per line")
+    parser.add_argument('--out', default=TABLE_PATH)
+    args = parser.parse_args()
+
+    # 1) Load the model the server serves with INFERENCE_MODE=fused, fresh from disk:
+    if args.fused:
+        model_files = (FUSED_WEIGHTS,)
+        predict = load_predictor(FUSED_WEIGHTS, scaler_path=None)
+    else:
+        model_files = (MODEL_WEIGHTS, SCALER_PATH)
+        predict = load_predictor()
+
+    # 2) Predict both sides of every match:
+    with open(args.features) as f:
+        feature_cols = [line.strip() for line in f if line.strip()]
+    team_mtime = os.path.getmtime(TEAM_DATA_PATH)
+    with open(TEAM_DATA_PATH, 'rb') as f:
+        td = pickle.load(f)
+    started = time.perf_counter()
+    rows = season_rows(TeamData(td['team_df'], td['match_df'], team_mtime), feature_cols, predict)
+
+    # 3) Write the table with the version of what it was built from, as
+    #    server.season_table_version() names it:
+    write_table(args.out, rows, f"fused:{file_version(*model_files)}|{TEAM_DATA_PATH}:{team_mtime}")
+    print(f"Predicted {len(rows)} team-matches ({rows.groupby(['team_id', 'season']).ngroups} team-seasons) "
+          f"in {time.perf_counter() - started:.2f}s → saved {args.out}")
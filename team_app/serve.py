@@ -0,0 +1,113 @@
+# serve.py
+#
+# Production entry point: pre-forks N worker processes that share one copy of
+# the model weights and scaler arrays.
+#
+#   python serve.py --workers 4 --port 8000
+#
+# The parent loads everything once (`import server` + server.preload()), moves the torch
+# parameters into shared memory and freezes the GC so the forked workers keep
+# sharing those pages instead of copying them. Each worker serves the same
+# listening socket with werkzeug's threaded WSGI server. Per-process state
+# (the /predict/step team states, caches, metrics) is not shared between
+# workers; run --workers 1 if clients rely on /predict/step continuing a history.
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+
+
+def parse_args():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Pre-forking server for the team app")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=min(4, cpus))
+    parser.add_argument('--threads', type=int, default=None,
+                        help="torch/BLAS intra-op threads per worker (default: cores // workers)")
+    args = parser.parse_args()
+    if args.threads is None:
+        args.threads = max(1, cpus // args.workers)
+    return args
+
+
+def share_model_memory(model):
+    """Move torch parameters/buffers into shared memory (NumPy weights stay copy-on-write)."""
+    share = getattr(model, 'share_memory', None)
+    if share is not None:
+        share()
+
+
+def run_worker(app, sock, args):
+    from werkzeug.serving import make_server
+    import torch
+    torch.set_num_threads(args.threads)
+    srv = make_server(args.host, args.port, app, threaded=True, fd=sock.fileno())
+    srv.serve_forever()
+
+
+def main():
+    args = parse_args()
+
+    # Thread pools are sized when numpy/torch load, so set this before importing them
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(args.threads)
+    import torch
+    torch.set_num_threads(args.threads)
+
+    # No background work runs in the parent before the fork: the season table
+    # refresh thread only starts on a worker's first team query
+    import server
+    server.preload()
+    share_model_memory(server.model)
+    share_model_memory(server.recurrent_model())
+
+    sock = socket.create_server((args.host, args.port), backlog=128)
+    sock.set_inheritable(True)
+
+    # Objects created so far are never freed; keep the GC from writing to
+    # their pages in the children
+    gc.freeze()
+
+    children = set()
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                run_worker(server.app, sock, args)
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def shutdown(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for _ in range(args.workers):
+        spawn()
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers "
+          f"x {args.threads} threads")
+
+    # Replace workers that die
+    while True:
+        pid, status = os.wait()
+        children.discard(pid)
+        print(f"Worker {pid} exited with status {status}; restarting")
+        spawn()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+# serve_async.py
+#
+# Async (ASGI) entry point: the event loop receives request bodies and sends
+# responses, while the Flask handlers (CSV parsing, feature building,
+# inference, HTML rendering) run on a bounded thread pool.
+#
+#   python serve_async.py --workers 4 --queue 8 --port 8000
+#   uvicorn serve_async:app --port 8000          # same app, settings from env
+#
+# A slow upload only holds a coroutine, not a pool thread: the loop spools the
+# body into a SpooledTemporaryFile (memory up to SPOOL_MAX_BYTES, then disk),
+# so large uploads such as /predict/csv stay bounded in memory. Once its body
+# is in, a request takes one of `workers + queue` slots; when all slots are
+# taken it gets 503 with Retry-After at once instead of waiting in an
+# unbounded queue. Streamed responses (/predict/csv) are produced chunk by
+# chunk on the pool and sent from the loop, holding their slot until the last
+# chunk. /metrics and /predict/stats run on a separate one-thread pool and are
+# never refused, so monitoring keeps working under overload.
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+ASYNC_WORKERS   = int(os.environ.get('ASYNC_WORKERS', min(4, os.cpu_count() or 1)))   # pool threads
+ASYNC_QUEUE     = int(os.environ.get('ASYNC_QUEUE', 2 * ASYNC_WORKERS))   # admitted requests waiting for a thread
+MAX_BODY_BYTES  = int(os.environ.get('MAX_BODY_BYTES', 0))   # 413 above this; 0 = no limit, as under WSGI
+SPOOL_MAX_BYTES = int(os.environ.get('SPOOL_MAX_BYTES', 1024 * 1024))   # request body kept in memory up to this
+RETRY_AFTER_S   = int(os.environ.get('RETRY_AFTER_S', 1))
+UNQUEUED_PATHS  = {'/metrics', '/predict/stats'}   # cheap reads on their own thread, never refused
+
+
+class OffloadPool:
+    """
+    Thread pool with admission control. `try_acquire` hands out at most
+    `workers + queue` slots and is only called from the event loop, so a plain
+    counter is enough; work for a held slot goes through `run`.
+    """
+    def __init__(self, workers, queue):
+        self.workers = workers
+        self.limit = workers + queue
+        self.in_flight = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asgi-offload')
+
+    def try_acquire(self):
+        if self.in_flight >= self.limit:
+            metrics.OVERLOAD_REJECTIONS.inc()
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def content_length(scope):
+    """Declared Content-Length of an ASGI http scope, None if absent; ValueError if malformed."""
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'content-length':
+            length = int(value)
+            if length < 0:
+                raise ValueError(f"negative Content-Length {length}")
+            return length
+    return None
+
+
+def wsgi_environ(scope, body, length):
+    """WSGI environ for one ASGI http scope; body: file holding its `length` received bytes."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(length),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        if name == 'content-length':
+            continue
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+            continue
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def send_plain(send, status, text, headers=()):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain; charset=utf-8'), *headers]})
+    await send({'type': 'http.response.body', 'body': text.encode()})
+
+
+class AsyncApp:
+    """ASGI app serving a WSGI app (server.app) through an OffloadPool."""
+    def __init__(self, wsgi_app, pool, max_body=MAX_BODY_BYTES):
+        self.wsgi_app = wsgi_app
+        self.pool = pool
+        self.unqueued_pool = OffloadPool(1, 0)   # UNQUEUED_PATHS; no admission control
+        self.max_body = max_body
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        # 1) Receive the body on the loop into a spooled file, refusing
+        #    malformed or (with MAX_BODY_BYTES) oversized uploads early:
+        try:
+            declared = content_length(scope)
+        except ValueError:
+            return await send_plain(send, 400, "Invalid Content-Length header.")
+        if self.max_body and declared is not None and declared > self.max_body:
+            return await send_plain(send, 413, "Request body too large.")
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as body:
+            size = 0
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                chunk = message.get('body', b'')
+                size += len(chunk)
+                if self.max_body and size > self.max_body:
+                    return await send_plain(send, 413, "Request body too large.")
+                body.write(chunk)
+                if not message.get('more_body', False):
+                    break
+            body.seek(0)
+            environ = wsgi_environ(scope, body, size)
+
+            # 2) Monitoring routes skip admission; everything else needs a slot:
+            if scope['path'] in UNQUEUED_PATHS:
+                return await self.respond(environ, send, self.unqueued_pool)
+            if not self.pool.try_acquire():
+                return await send_plain(send, 503, "Server busy, retry shortly.",
+                                        [(b'retry-after', str(RETRY_AFTER_S).encode())])
+            try:
+                await self.respond(environ, send, self.pool)
+            finally:
+                self.pool.release()
+
+    async def respond(self, environ, send, pool):
+        run = pool.run
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+        # 3) Run the handler, then pull the body one chunk at a time; each
+        #    chunk (a streamed CSV chunk is parsed + predicted here) is built
+        #    on the pool and sent from the loop:
+        response = await run(self.wsgi_app, environ, start_response)
+        chunks = iter(response)
+        try:
+            await send({'type': 'http.response.start', 'status': started['status'],
+                        'headers': started['headers']})
+            while True:
+                chunk = await run(next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            close = getattr(response, 'close', None)
+            if close is not None:
+                await run(close)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.pool.shutdown()
+                self.unqueued_pool.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_app(workers=ASYNC_WORKERS, queue=ASYNC_QUEUE, max_body=MAX_BODY_BYTES):
+    import server
+    server.preload()
+    return AsyncApp(server.app, OffloadPool(workers, queue), max_body)
+
+
+def __getattr__(name):
+    # `uvicorn serve_async:app` builds the app on first access, so importing
+    # this module for its helpers does not load the model
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASGI server for the team app")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=ASYNC_WORKERS, help="offload pool threads")
+    parser.add_argument('--queue', type=int, default=ASYNC_QUEUE,
+                        help="requests admitted beyond --workers before answering 503")
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("serve_async.py needs an ASGI server: pip install uvicorn")
+    app = create_app(args.workers, args.queue)
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} pool threads "
+          f"+ {args.queue} queued")
+    uvicorn.run(app, host=args.host, port=args.port, lifespan='on')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,22 @@
-from flask import Flask, request, render_template
-import pandas as pd
+from flask import Flask, request, render_template, jsonify, Response, url_for, abort, g
 import numpy as np
-import pickle
 import torch
-import joblib
-import matplotlib.pyplot as plt
 import io
-import base64
-from playernn import PlayerRatingLSTM
+import os
+import json
+import time
+import cProfile
+import threading
+import functools
+import shutil
+import tempfile
+from batcher import MicroBatcher
+from prediction_cache import PredictionCache
+from artifacts import file_version
+import metrics
+# pandas, matplotlib, sklearn (via the scaler) and the team modules are
+# imported where first used, so a worker that only serves /predict starts
+# without them; preload() pulls them in ahead of time
 
 app = Flask(__name__)
 
@@ -15,306 +24,682 @@ app = Flask(__name__)
 INPUT_SIZE        = 40
 MODEL_WEIGHTS     = 'player_nn_model_weights.pth'
 SCALER_PATH       = 'scaler.pkl'
+FUSED_WEIGHTS     = 'player_nn_model_fused.pth'   # written by fuse_scaler.py
+INT8_WEIGHTS      = 'player_nn_model_int8.pth'    # written by quantize_model.py
+FUSED_INT8_WEIGHTS = 'player_nn_model_fused_int8.pth'   # quantize_model.py --fused
+SCRIPTED_MODEL    = 'player_nn_model_scripted.pt'  # written by export_model.py, scaler included
 TEAM_DATA_PATH    = 'team.pkl'
+FEATURE_COLS_PATH = 'attributes.txt'   # model input columns, one per line, home-team naming
+PREDICT_MAX_ROWS  = int(os.environ.get('PREDICT_MAX_ROWS', 10000))
+BATCH_MAX_ROWS    = int(os.environ.get('BATCH_MAX_ROWS', 512))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', 2.0))
+PREDICT_CACHE_ROWS = int(os.environ.get('PREDICT_CACHE_ROWS', 100000))  # 0 disables
+STATE_CACHE_TEAMS = int(os.environ.get('STATE_CACHE_TEAMS', 10000))
+STREAM_CHUNK_ROWS = int(os.environ.get('STREAM_CHUNK_ROWS', 10000))
+INFERENCE_MODE    = os.environ.get('INFERENCE_MODE', 'fused')   # 'lstm', 'fused', 'numpy', 'int8' or 'scripted'
+SCALER_FUSED      = os.environ.get('SCALER_FUSED', '0') == '1'  # model takes raw features
+SEASON_TABLE      = os.environ.get('SEASON_TABLE', '')   # e.g. season_predictions.sqlite; '' = always live
+SEASON_TABLE_CHECK_S = float(os.environ.get('SEASON_TABLE_CHECK_S', 30.0))
+WARMUP_RUNS       = int(os.environ.get('WARMUP_RUNS', 3))   # startup forward passes per batch shape
+PROFILE_REQUESTS  = os.environ.get('PROFILE_REQUESTS', '0') == '1'   # allow ?profile=1 on any route
+PROFILE_DIR       = os.environ.get('PROFILE_DIR', 'profiles')
+
+def load_lstm_model(fold_scaler=False):
+    """The trained PlayerRatingLSTM; fold_scaler=True makes it take raw features"""
+    from playernn import PlayerRatingLSTM, fold_input_scaler
+    m = PlayerRatingLSTM(input_size=INPUT_SIZE)
+    m.load_state_dict(torch.load(FUSED_WEIGHTS if SCALER_FUSED else MODEL_WEIGHTS, map_location='cpu'))
+    if fold_scaler and not SCALER_FUSED:
+        import joblib
+        s = joblib.load(SCALER_PATH)
+        fold_input_scaler(m, s.mean_, s.scale_)
+    return m.eval()
+
+scripted_feature_cols = None
+if INFERENCE_MODE == 'scripted':
+    # Self-contained TorchScript export: the scaler is folded into the weights,
+    # so neither the model class nor sklearn is needed to serve /predict
+    extra = {'feature_cols.json': '', 'source.txt': b''}
+    model = torch.jit.load(SCRIPTED_MODEL, map_location='cpu', _extra_files=extra)
+    scripted_feature_cols = json.loads(extra['feature_cols.json'] or 'null')
+    # The export records the weight + scaler files it was built from; when
+    # they are here and have changed since, the export is stale
+    try:
+        on_disk = file_version(MODEL_WEIGHTS, SCALER_PATH)
+    except OSError:
+        on_disk = None   # served from the export alone
+    if extra['source.txt'] and on_disk and extra['source.txt'].decode() != on_disk:
+        app.logger.warning("%s is stale: %s or %s changed since it was exported; re-run export_model.py",
+                           SCRIPTED_MODEL, MODEL_WEIGHTS, SCALER_PATH)
+    lstm_model = None   # loaded by recurrent_model() on the first multi-step request
+else:
+    # Load your best, pre-trained model (no training here)
+    model = load_lstm_model()
+    lstm_model = model   # full recurrent model, used for multi-step histories
+
+# seq_len=1 fast path: LSTM folded into dense layers, checked against the LSTM
+if INFERENCE_MODE == 'fused':
+    model = lstm_model.to_fast_inference()
+elif INFERENCE_MODE == 'numpy':
+    model = lstm_model.to_fast_inference().to_numpy()
+elif INFERENCE_MODE == 'int8':
+    # Dynamic int8 LSTM + fc (CPU only); see quantize_model.py for its accuracy/latency report
+    from playernn import load_quantized
+    model = load_quantized(FUSED_INT8_WEIGHTS if SCALER_FUSED else INT8_WEIGHTS, INPUT_SIZE)
+
+# Load your pre-fitted scaler (already folded into the weights when SCALER_FUSED
+# or in the scripted export)
+scaler = None
+if not SCALER_FUSED and INFERENCE_MODE != 'scripted':
+    import joblib
+    scaler = joblib.load(SCALER_PATH)
+
+@functools.lru_cache(maxsize=None)
+def recurrent_model():
+    """Full LSTM for multi-step histories, taking the same inputs as `model`"""
+    if lstm_model is not None:
+        return lstm_model
+    return load_lstm_model(fold_scaler=True)
+
+@functools.lru_cache(maxsize=None)
+def team_store():
+    # Team/match data is loaded once and shared; reloaded when team.pkl changes
+    from team_store import TeamStore
+    return TeamStore(TEAM_DATA_PATH)
+
+@functools.lru_cache(maxsize=None)
+def feature_cols():
+    """
+    Column order of the model's inputs, for building features from match_df:
+    attributes.txt if it lists any, else the names the scaler was fitted on.
+    Raises ValueError when neither gives INPUT_SIZE columns (not cached, so
+    fixing attributes.txt takes effect on the next query).
+    """
+    cols, source = None, None
+    if os.path.exists(FEATURE_COLS_PATH):
+        with open(FEATURE_COLS_PATH) as f:
+            cols = [line.strip() for line in f if line.strip()] or None
+        source = FEATURE_COLS_PATH
+    if cols is None and scripted_feature_cols:
+        cols, source = list(scripted_feature_cols), f"the feature names in {SCRIPTED_MODEL}"
+    if cols is None and scaler is not None and hasattr(scaler, 'feature_names_in_'):
+        cols, source = list(scaler.feature_names_in_), f"the feature names in {SCALER_PATH}"
+    if cols is None:
+        raise ValueError(f"Model feature columns unknown: {FEATURE_COLS_PATH} is missing or empty "
+                         f"and the scaler has no feature names. List the model's {INPUT_SIZE} "
+                         f"input columns in {FEATURE_COLS_PATH}, one per line.")
+    if len(cols) != INPUT_SIZE:
+        raise ValueError(f"{source} lists {len(cols)} feature columns; model expects {INPUT_SIZE}.")
+    return cols
+
+def preprocess(X):
+    """Raw feature rows -> model input; no extra pass when the scaler is fused"""
+    with metrics.stage('scaler_transform'):
+        if scaler is None:
+            return np.asarray(X, dtype=np.float32)
+        return scaler.transform(X)
+
+def run_model(Xs):
+    """Scaled features (n, INPUT_SIZE) -> float32 predictions (n,)"""
+    if INFERENCE_MODE == 'numpy':
+        return model(Xs).reshape(-1)
+    Xt = torch.as_tensor(Xs, dtype=torch.float32).unsqueeze(1)
+    with torch.no_grad():
+        return model(Xt).reshape(-1).numpy()
+
+def run_model_timed(Xs):
+    with metrics.stage('forward'):
+        return run_model(Xs)
+
+# All forward passes go through one queue so concurrent requests share a batch
+batcher = MicroBatcher(run_model_timed, max_rows=BATCH_MAX_ROWS, max_wait_ms=BATCH_MAX_WAIT_MS)
+
+# The model this process serves, as loaded above; it is never swapped, so
+# new weights on disk take effect on restart
+model_files = [FUSED_WEIGHTS] if SCALER_FUSED else [MODEL_WEIGHTS, SCALER_PATH]
+if INFERENCE_MODE == 'int8':
+    model_files.append(FUSED_INT8_WEIGHTS if SCALER_FUSED else INT8_WEIGHTS)
+elif INFERENCE_MODE == 'scripted':
+    model_files = [SCRIPTED_MODEL]
+MODEL_VERSION = f"{INFERENCE_MODE}:{file_version(*model_files)}"
+
+# Repeated feature rows are answered from the cache; only misses hit the model
+prediction_cache = PredictionCache(PREDICT_CACHE_ROWS)
+
+def predict_rows(X):
+    """Raw feature rows (n, INPUT_SIZE) -> float32 predictions (n,)"""
+    return prediction_cache.predict(X, lambda rows: batcher.submit(preprocess(rows)))
+
+def season_table_version(team_mtime=None):
+    """What a current season table is built from: the served model and team.pkl as of team_mtime"""
+    if team_mtime is None:
+        team_mtime = os.path.getmtime(TEAM_DATA_PATH)
+    return f"{MODEL_VERSION}|{TEAM_DATA_PATH}:{team_mtime}"
+
+def rebuild_season_table(path, version):
+    # The served model, not the weights on disk, so table answers match
+    # /predict and the live fallback; straight to the model, bypassing the
+    # batch queue and the row cache
+    from season_table import season_rows, write_table
+    td = team_store().get(recheck=True)
+    if season_table_version(td.mtime) != version:
+        # team.pkl changed again since `version` was taken, or is mid-rewrite:
+        # never stamp a table with a version its matches do not come from
+        raise RuntimeError(f"{TEAM_DATA_PATH} changed during the season table rebuild; retrying later")
+    rows = season_rows(td, feature_cols(), lambda X: run_model(preprocess(X)))
+    write_table(path, rows, version)
+
+# Team/season queries answered from the precomputed table while it was built
+# by the served model from the current team.pkl; rebuilt in the background
+# when team.pkl changes or a restart loads other weights
+season_table = None
+if SEASON_TABLE:
+    from season_table import SeasonTable
+    season_table = SeasonTable(SEASON_TABLE, season_table_version, rebuild_season_table,
+                               check_interval=SEASON_TABLE_CHECK_S)
+
+def warm_up():
+    """
+    Run the model on the batch shapes requests will use before serving, so
+    lazy initialisation (allocator, oneDNN kernels, TorchScript's profiling
+    runs) is not paid by the first requests.
+    """
+    for n in (1, BATCH_MAX_ROWS):
+        for _ in range(WARMUP_RUNS):
+            run_model(np.zeros((n, INPUT_SIZE), dtype=np.float32))
+
+warm_up()
+
+GOAL_BINS = np.arange(0, 8)
+
+def goal_histogram(df):
+    """Counts of Actual_Team_Goals over GOAL_BINS (same bins as the old pandas hist)"""
+    counts, _ = np.histogram(df['Actual_Team_Goals'], bins=GOAL_BINS)
+    return tuple(int(c) for c in counts)
+
+@functools.lru_cache(maxsize=256)
+def render_goal_distribution(counts):
+    # Object-oriented Figure + Agg canvas: no pyplot global state, so
+    # concurrent requests can render without contending on it
+    with metrics.stage('plot'):
+        from matplotlib.figure import Figure
+        fig = Figure()
+        ax = fig.subplots()
+        ax.bar(GOAL_BINS[:-1], counts, width=1.0, align='edge', alpha=0.7)
+        ax.set(title="Team Goal Distribution", xlabel="Goals", ylabel="Frequency")
+        fig.tight_layout()
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png')
+        return buf.getvalue()
+
+def goal_distribution_url(df):
+    # The histogram itself is the cache key, so any worker can serve the URL
+    return url_for('goal_distribution_png', counts='-'.join(map(str, goal_histogram(df))))
+
+@app.route('/plot/goals/<counts>.png')
+def goal_distribution_png(counts):
+    try:
+        key = tuple(int(c) for c in counts.split('-'))
+    except ValueError:
+        abort(404)
+    if len(key) != len(GOAL_BINS) - 1 or min(key) < 0:
+        abort(404)
+    response = Response(render_goal_distribution(key), mimetype='image/png')
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response
+
+def live_season_table(td, team_id, start_date, end_date):
+    from team_features import team_perspective, outcomes
+    matches = td.team_matches_between(team_id, start_date, end_date)
+    if matches.empty:
+        return None
+    cols = feature_cols()
+    with metrics.stage('team_features'):
+        table, X_team, X_opp = team_perspective(matches, team_id, cols, td.team_names_by_id)
+
+    # Team and opponent goals in one batched forward pass
+    preds = np.rint(predict_rows(np.vstack([X_team, X_opp]))).astype(int)
+    n = len(table)
+    table['Predicted_Team_Goals'] = preds[:n]
+    table['Predicted_Opponent_Goals'] = preds[n:]
+    table['Actual_Outcome'], table['Actual_Points'] = outcomes(table['Actual_Team_Goals'], table['Actual_Opponent_Goals'])
+    table['Predicted_Outcome'], table['Predicted_Points'] = outcomes(table['Predicted_Team_Goals'], table['Predicted_Opponent_Goals'])
+    return table
+
+def team_season_result(team_name, start_date, end_date):
+    """HTML comparing actual and predicted results for one team over a date range"""
+    import pandas as pd
+    td = team_store().get()
+    team_id = td.team_ids.get(team_name)
+    if team_id is None:
+        return f"Unknown team: {team_name}"
+
+    table = season_table.query(team_id, start_date, end_date) if season_table is not None else None
+    if table is None:
+        table = live_season_table(td, team_id, start_date, end_date)
+    if table is None or table.empty:
+        return "No matches found for that period."
+    n = len(table)
+    g.rows = n
+
+    # Sort by date, format dates
+    table = table.sort_values(by='date', kind='stable').reset_index(drop=True)
+    table['date'] = pd.to_datetime(table['date']).dt.strftime('%Y-%m-%d')
+    table['Actual_Score'] = table['Actual_Team_Goals'].astype(str) + ' - ' + table['Actual_Opponent_Goals'].astype(str)
+    table['Predicted_Score'] = table['Predicted_Team_Goals'].astype(str) + ' - ' + table['Predicted_Opponent_Goals'].astype(str)
+
+    with metrics.stage('to_html'):
+        actual_html = table[['date', 'Opponent', 'Venue', 'Actual_Score', 'Actual_Outcome']].to_html(classes="table table-striped", index=False)
+        predictions_html = table[['date', 'Opponent', 'Venue', 'Predicted_Score', 'Predicted_Outcome']].to_html(classes="table table-striped", index=False)
+
+    actual_record = table['Actual_Outcome'].value_counts()
+    predicted_record = table['Predicted_Outcome'].value_counts()
+    outcome_accuracy = (table['Actual_Outcome'] == table['Predicted_Outcome']).mean() * 100
+
+    return f"""
+        <h3>Results for {team_name} ({n} matches from {start_date} to {end_date})</h3>
+        <div style="display: flex; gap: 30px; flex-wrap: wrap;">
+            <div style="flex: 1; min-width: 300px;">
+                <h4>Actual Results</h4>
+                {actual_html}
+            </div>
+            <div style="flex: 1; min-width: 300px;">
+                <h4>Predicted Results</h4>
+                {predictions_html}
+            </div>
+        </div>
 
-# Load your best, pre-trained model (no training here)
-model = PlayerRatingLSTM(input_size=INPUT_SIZE)
-model.load_state_dict(torch.load(MODEL_WEIGHTS, map_location='cpu'))
-model.eval()
+        <hr>
 
-# Load your pre-fitted scaler
-scaler = joblib.load(SCALER_PATH)
+        <h4>Actual Summary</h4>
+        <ul>
+            <li>Average Goals Scored by Team: {table['Actual_Team_Goals'].mean():.2f}</li>
+            <li>Average Goals Conceded: {table['Actual_Opponent_Goals'].mean():.2f}</li>
+            <li>Record (W-D-L): {actual_record.get('Win', 0)}-{actual_record.get('Draw', 0)}-{actual_record.get('Loss', 0)}</li>
+            <li>Season Score: {table['Actual_Points'].sum()} points</li>
+        </ul>
+        <h4>Predicted Summary</h4>
+        <ul>
+            <li>Average Goals Scored by Team: {table['Predicted_Team_Goals'].mean():.2f}</li>
+            <li>Average Goals Conceded: {table['Predicted_Opponent_Goals'].mean():.2f}</li>
+            <li>Record (W-D-L): {predicted_record.get('Win', 0)}-{predicted_record.get('Draw', 0)}-{predicted_record.get('Loss', 0)}</li>
+            <li>Season Score: {table['Predicted_Points'].sum()} points</li>
+        </ul>
 
-def plot_goal_distribution(df):
-    fig, ax = plt.subplots()
-    df['Actual_Team_Goals'].plot(kind='hist', bins=range(0,8), ax=ax, alpha=0.7)
-    ax.set(title="Team Goal Distribution", xlabel="Goals", ylabel="Frequency")
-    buf = io.BytesIO()
-    plt.tight_layout(); plt.savefig(buf, format='png'); plt.close(fig)
-    buf.seek(0)
-    return base64.b64encode(buf.getvalue()).decode('utf-8')
+        <h4>Model Performance Metrics</h4>
+        <ul>
+            <li>Outcome Accuracy: {outcome_accuracy:.2f}%</li>
+        </ul>
+        """
 
 @app.route('/', methods=['GET','POST'])
 def index():
     error = None
     result_html = None
-    plot_img = None
+    plot_url = None
+    team_name = None
+    start_date = ''
+    end_date = ''
 
     # Prepare team list
-    with open(TEAM_DATA_PATH, 'rb') as f:
-        td = pickle.load(f)
-    team_df  = td['team_df']
-    match_df = td['match_df']
-    ids = pd.unique(pd.concat([match_df.home_team_api_id, match_df.away_team_api_id]))
-    names = sorted(team_df[team_df.team_api_id.isin(ids)].team_long_name.unique())
-
-    if request.method == 'POST':
+    names = team_store().get().team_names
+
+    if request.method == 'POST' and 'team_name' in request.form:
+        # Team season query
+        team_name = request.form['team_name']
+        start_date = request.form.get('start_date', '')
+        end_date = request.form.get('end_date', '')
+        try:
+            result_html = team_season_result(team_name, start_date, end_date)
+        except Exception as e:
+            error = f"Team query error: {e}"
+
+    elif request.method == 'POST':
         csvfile = request.files.get('csvfile')
         if csvfile:
             try:
-                df = pd.read_csv(csvfile)
+                import pandas as pd
+                with metrics.stage('read_csv'):
+                    df = pd.read_csv(csvfile)
                 X  = df.drop(columns=['Actual_Team_Goals'], errors='ignore')
-                Xs = scaler.transform(X)
+                g.rows = len(X)
 
-                if Xs.shape[1] != INPUT_SIZE:
-                    error = (f"Got {Xs.shape[1]} features; model expects {INPUT_SIZE}. "
+                if X.shape[1] != INPUT_SIZE:
+                    error = (f"Got {X.shape[1]} features; model expects {INPUT_SIZE}. "
                              "Please upload a CSV with the correct columns.")
                 else:
-                    Xt = torch.tensor(Xs, dtype=torch.float32).unsqueeze(1)
-                    with torch.no_grad():
-                        preds = model(Xt).squeeze().numpy()
+                    preds = predict_rows(X)
                     df['Predicted_Team_Goals'] = np.rint(preds).astype(int)
-                    result_html = df.to_html(classes='data', index=False)
-                    plot_img    = plot_goal_distribution(df)
+                    with metrics.stage('to_html'):
+                        result_html = df.to_html(classes='data', index=False)
+                    if 'Actual_Team_Goals' in df:
+                        plot_url = goal_distribution_url(df)
 
             except Exception as e:
                 error = f"CSV processing error: {e}"
 
     return render_template('index.html',
                            team_names=names,
+                           team_name=team_name,
+                           start_date=start_date,
+                           end_date=end_date,
                            result=result_html,
-                           plot_img=plot_img,
+                           plot_url=plot_url,
                            error=error)
 
-if __name__ == '__main__':
-    app.run(debug=True)
-
-
-
-
-'''
-def index():
-    result = ""
-    team_names = sorted(filtered_team_df['team_long_name'].unique())
-    team_name = None
-    start_date = ''
-    end_date = ''
-
-    if request.method == 'POST':
-        team_name = request.form['team_name']
-        start_date = request.form['start_date']
-        end_date = request.form['end_date']
-
-        print({team_name}, {start_date}, {end_date})
-        
-        # # === BEGIN core logic from your code === #
-        # # Get team ID
-        filtered_team = team_df[team_df['team_long_name'] == team_name]
-
-        team_id = filtered_team['team_api_id'].values[0]
-
-        # Filter matches
-        team_matches = match_df[
-            ((match_df['home_team_api_id'] == team_id) | (match_df['away_team_api_id'] == team_id)) &
-            (match_df['date'] >= start_date) & (match_df['date'] <= end_date)
-        ].copy()
-        
-        if team_matches.empty:
-            return render_template('index.html', team_names=team_names, result="No matches found for that period.")
-
-        # Compute perspective features
-        team_matches['Venue'] = team_matches.apply(lambda row: 'Home' if row['home_team_api_id'] == team_id else 'Away', axis=1)
-        team_matches['is_home'] = team_matches['Venue'].map({'Home': 1, 'Away': 0})
-        team_matches['Opponent'] = team_matches.apply(
-            lambda row: team_dict.get(row['away_team_api_id']) if row['Venue'] == 'Home' else team_dict.get(row['home_team_api_id']), axis=1
-        )
-        team_matches['team_goals'] = team_matches.apply(
-            lambda row: row['home_team_goal'] if row['Venue'] == 'Home' else row['away_team_goal'], axis=1
-        )
-        team_matches['opponent_goals'] = team_matches.apply(
-            lambda row: row['away_team_goal'] if row['Venue'] == 'Home' else row['home_team_goal'], axis=1
-        )
-        team_matches['prob_team'] = team_matches.apply(
-            lambda row: row['prob_home'] if row['Venue'] == 'Home' else row['prob_away'], axis=1
-        )
-        team_matches['prob_opponent'] = team_matches.apply(
-            lambda row: row['prob_away'] if row['Venue'] == 'Home' else row['prob_home'], axis=1
-        )
-        team_matches['betting_median_team'] = team_matches.apply(
-            lambda row: row['betting_median_home'] if row['Venue'] == 'Home' else row['betting_median_away'], axis=1
-        )
-        team_matches['betting_median_opponent'] = team_matches.apply(
-            lambda row: row['betting_median_away'] if row['Venue'] == 'Home' else row['betting_median_home'], axis=1
-        )
-        team_matches['avg_team_player_overall'] = team_matches.apply(
-            lambda row: row['avg_home_player_overall'] if row['Venue'] == 'Home' else row['avg_away_player_overall'], axis=1
-        )
-        team_matches['avg_opponent_player_overall'] = team_matches.apply(
-            lambda row: row['avg_away_player_overall'] if row['Venue'] == 'Home' else row['avg_home_player_overall'], axis=1
-        )
-        team_matches['Team_Form_Scored'] = team_matches.apply(
-            lambda row: row['Home_Form_Scored'] if row['Venue'] == 'Home' else row['Away_Form_Scored'], axis=1
-        )
-        team_matches['Team_Form_Conceded'] = team_matches.apply(
-            lambda row: row['Home_Form_Conceded'] if row['Venue'] == 'Home' else row['Away_Form_Conceded'], axis=1
-        )
-        team_matches['Opponent_Form_Scored'] = team_matches.apply(
-            lambda row: row['Away_Form_Scored'] if row['Venue'] == 'Home' else row['Home_Form_Scored'], axis=1
-        )
-        team_matches['Opponent_Form_Conceded'] = team_matches.apply(
-            lambda row: row['Away_Form_Conceded'] if row['Venue'] == 'Home' else row['Home_Form_Conceded'], axis=1
-        )
-
-        X_team = team_matches[[
-            'prob_team', 'prob_draw', 'prob_opponent',
-            'betting_median_team', 'betting_median_draw', 'betting_median_opponent',
-            'Team_Form_Scored', 'Team_Form_Conceded', 'Opponent_Form_Scored', 'Opponent_Form_Conceded',
-            'avg_team_player_overall', 'avg_opponent_player_overall', 'is_home'
-        ]].rename(columns={
-            'prob_team': 'prob_home',
-            'prob_opponent': 'prob_away',
-            'betting_median_team': 'betting_median_home',
-            'betting_median_opponent': 'betting_median_away',
-            'avg_team_player_overall': 'avg_home_player_overall',
-            'avg_opponent_player_overall': 'avg_away_player_overall',
-            'Team_Form_Scored': 'Home_Form_Scored',
-            'Team_Form_Conceded': 'Home_Form_Conceded',
-            'Opponent_Form_Scored': 'Away_Form_Scored',
-            'Opponent_Form_Conceded': 'Away_Form_Conceded'
-        })
-        import torch
-
-        # Reshape for LSTM: (batch_size, seq_len, input_size)
-        # Here, assuming one timestep per match (seq_len = 1)
-        X_tensor = torch.tensor(X_team.values, dtype=torch.float32).unsqueeze(1)  # shape: (N, 1, input_size)
-
-        # Predict using LSTM model
+def predict_sequences(sequences):
+    """
+    Variable-length histories, each a list of INPUT_SIZE-feature rows (oldest
+    first) -> float32 predictions, one per history. Histories are sorted by
+    length and run packed in groups whose padded size stays within
+    PREDICT_MAX_ROWS rows, so one long history does not pad all the others.
+    Raises ValueError for a history that is not a non-empty (rows, INPUT_SIZE)
+    list of finite numbers.
+    """
+    from player_data import pad_histories
+    rows = []
+    for i, seq in enumerate(sequences):
+        try:
+            r = np.asarray(seq, dtype=np.float32)
+        except (TypeError, ValueError):
+            raise ValueError(f"Sequence {i} must be a list of rows of {INPUT_SIZE} numbers.")
+        if r.ndim != 2 or r.shape[1] != INPUT_SIZE or len(r) == 0:
+            raise ValueError(f"Sequence {i} has shape {r.shape}; expected (rows >= 1, {INPUT_SIZE}).")
+        rows.append(r)
+    lengths = np.array([len(r) for r in rows], dtype=np.int64)
+    starts = np.r_[0, np.cumsum(lengths)[:-1]]
+    steps = np.asarray(preprocess(check_finite(np.concatenate(rows))), dtype=np.float32)
+    order = np.argsort(lengths, kind='stable')
+    preds = np.empty(len(rows), dtype=np.float32)
+    i = 0
+    while i < len(order):
+        j = i + 1
+        while j < len(order) and (j + 1 - i) * lengths[order[j]] <= PREDICT_MAX_ROWS:
+            j += 1
+        group = order[i:j]
+        X, group_lengths = pad_histories(steps, starts[group], lengths[group])
         with torch.no_grad():
-            y_pred_tensor = network(X_tensor).squeeze(1)  
-        y_pred = np.round(y_pred_tensor.numpy()).astype(int)
-        team_matches['Predicted_Team_Goals'] = np.round(y_pred).astype(int)
-        team_matches['Predicted_Team_Goals'] = np.round(model_team_goals.predict(X_team)).astype(int)
-
-
-        team_matches['Predicted_Opponent_Goals'] = team_matches.apply(
-            lambda row: int(round(model_team_goals.predict([[
-                row['prob_opponent'], row['prob_draw'], row['prob_team'],
-                row['betting_median_opponent'], row['betting_median_draw'], row['betting_median_team'],
-                row['Opponent_Form_Scored'], row['Opponent_Form_Conceded'], row['Team_Form_Scored'], row['Team_Form_Conceded'],
-                row['avg_opponent_player_overall'], row['avg_team_player_overall'], 1 if row['Venue'] == 'Away' else 0
-            ]])[0])), axis=1
-        )
-
-        team_matches['Actual_Team_Goals'] = team_matches['team_goals']
-        team_matches['Actual_Opponent_Goals'] = team_matches['opponent_goals']
-
-        def get_outcome(team_goals, opp_goals):
-            if team_goals > opp_goals: return 'Win'
-            elif team_goals == opp_goals: return 'Draw'
-            else: return 'Loss'
-
-        team_matches['Predicted_Outcome'] = team_matches.apply(
-            lambda row: get_outcome(row['Predicted_Team_Goals'], row['Predicted_Opponent_Goals']), axis=1
-        )
-        team_matches['Actual_Outcome'] = team_matches.apply(
-            lambda row: get_outcome(row['Actual_Team_Goals'], row['Actual_Opponent_Goals']), axis=1
-        )
-        
-        # Calculate points
-        def calculate_points(outcome):
-            if outcome == "Win":
-                return 3
-            elif outcome =='Draw':
-                return 1
+            preds[group] = recurrent_model()(X, group_lengths).reshape(-1).numpy()
+        i = j
+    return preds
+
+@functools.lru_cache(maxsize=None)
+def team_states():
+    # Live mode: per-team LSTM state, advanced one match at a time
+    from team_state import TeamStateCache
+    return TeamStateCache(recurrent_model(), max_teams=STATE_CACHE_TEAMS)
+
+def check_finite(X):
+    """X unchanged if all values are finite; null/NaN/inf inputs would give NaN predictions, which are not valid JSON"""
+    if not np.isfinite(X).all():
+        raise ValueError("Features must be finite numbers; got null, NaN or infinity.")
+    return X
+
+def parse_predict_rows():
+    """
+    Read a /predict request body into a float32 array (n, INPUT_SIZE).
+    Accepts JSON ({"rows": [[...], ...]} or a bare list of rows) or a raw
+    little-endian float32 buffer sent as application/octet-stream.
+    (JSON {"sequences": [...]} histories are handled by predict_sequences.)
+    """
+    if request.mimetype == 'application/octet-stream':
+        buf = request.get_data()
+        if len(buf) % (4 * INPUT_SIZE):
+            raise ValueError(f"Binary body must be n x {INPUT_SIZE} float32 values; "
+                             f"got {len(buf)} bytes.")
+        return check_finite(np.frombuffer(buf, dtype='<f4').reshape(-1, INPUT_SIZE))
+
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('rows')
+    if payload is None:
+        raise ValueError("Expected a JSON body with 'rows' or an application/octet-stream body.")
+    try:
+        X = np.asarray(payload, dtype=np.float32)
+    except (TypeError, ValueError):
+        raise ValueError(f"Rows must be lists of {INPUT_SIZE} numbers.")
+    if X.size == 0:
+        return X.reshape(0, INPUT_SIZE)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    if X.ndim != 2 or X.shape[1] != INPUT_SIZE:
+        raise ValueError(f"Got rows of shape {X.shape}; model expects (n, {INPUT_SIZE}).")
+    return check_finite(X)
+
+# Most bytes a /predict body may need per row: exact for float32 binary; for
+# JSON, generous room for a number (up to 24 characters) plus separators and
+# indentation. Larger bodies are refused before they are read and parsed.
+BINARY_ROW_BYTES = 4 * INPUT_SIZE
+JSON_ROW_BYTES   = 64 * INPUT_SIZE
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    # Batch API: raw features in, raw model outputs back; no HTML or plotting
+    row_bytes = BINARY_ROW_BYTES if request.mimetype == 'application/octet-stream' else JSON_ROW_BYTES
+    if request.content_length is not None and request.content_length > PREDICT_MAX_ROWS * row_bytes:
+        return jsonify(error=f"Body of {request.content_length} bytes exceeds the limit of "
+                             f"{PREDICT_MAX_ROWS} rows."), 413
+    payload = request.get_json(silent=True) if request.is_json else None
+    if isinstance(payload, dict) and 'sequences' in payload:
+        sequences = payload['sequences']
+        if not isinstance(sequences, list) or not sequences:
+            return jsonify(error="'sequences' must be a non-empty list of histories."), 400
+        # The limit counts history rows, not histories: padded cost grows with both
+        total = sum(len(seq) if isinstance(seq, list) else 1 for seq in sequences)
+        if total > PREDICT_MAX_ROWS:
+            return jsonify(error=f"Batch of {total} history rows exceeds the limit of {PREDICT_MAX_ROWS}."), 413
+        g.rows = total
+        try:
+            preds = predict_sequences(sequences)
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        return jsonify(predictions=preds.tolist())
+
+    try:
+        X = parse_predict_rows()
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    g.rows = len(X)
+    if len(X) > PREDICT_MAX_ROWS:
+        return jsonify(error=f"Batch of {len(X)} rows exceeds the limit of {PREDICT_MAX_ROWS}."), 413
+
+    preds = predict_rows(X) if len(X) else np.empty(0, dtype=np.float32)
+
+    if (request.args.get('format') == 'binary' or
+            request.accept_mimetypes.best == 'application/octet-stream'):
+        return Response(preds.astype('<f4').tobytes(), mimetype='application/octet-stream')
+    return jsonify(predictions=preds.tolist())
+
+def predict_chunk(chunk):
+    """Add Predicted_Team_Goals to one CSV chunk (same columns as the / upload)"""
+    X = chunk.drop(columns=['Actual_Team_Goals'], errors='ignore')
+    if X.shape[1] != INPUT_SIZE:
+        raise ValueError(f"Got {X.shape[1]} features; model expects {INPUT_SIZE}.")
+    try:
+        X = X.to_numpy(dtype=np.float32)
+    except (TypeError, ValueError):
+        raise ValueError("Feature columns must be numeric.")
+    chunk['Predicted_Team_Goals'] = np.rint(predict_rows(check_finite(X))).astype(int)
+    return chunk
+
+@app.route('/predict/csv', methods=['POST'])
+def predict_csv():
+    # Streaming mode: the CSV is read, scaled and predicted STREAM_CHUNK_ROWS
+    # at a time and each chunk is written out before the next one is parsed,
+    # so memory stays bounded by the chunk size rather than the upload size.
+    # The status is sent with the first chunk; if a later chunk fails, the
+    # stream ends with an error record ({"error": ...} line for ndjson, a
+    # "# error: ..." line for CSV) and team_app_stream_errors_total counts it.
+    import pandas as pd
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify(error="format must be 'csv' or 'ndjson'"), 400
+    csvfile = request.stream
+    if 'csvfile' in request.files:
+        # Form uploads are closed with the request, before the response is
+        # streamed; spool to a temp file we own (disk, not memory)
+        csvfile = tempfile.TemporaryFile()
+        shutil.copyfileobj(request.files['csvfile'].stream, csvfile)
+        csvfile.seek(0)
+
+    # Validate the first chunk up front so bad uploads still get a 400
+    try:
+        reader = pd.read_csv(csvfile, chunksize=STREAM_CHUNK_ROWS)
+        with metrics.stage('read_csv'):
+            first = next(reader)
+        first = predict_chunk(first)
+    except (StopIteration, pd.errors.EmptyDataError):
+        return jsonify(error="Empty CSV upload."), 400
+    except Exception as e:
+        return jsonify(error=f"CSV processing error: {e}"), 400
+
+    def generate():
+        # Runs after the request has returned; rows are recorded once the stream ends
+        chunk, header, rows = first, True, 0
+        try:
+            while chunk is not None:
+                rows += len(chunk)
+                if fmt == 'ndjson':
+                    yield chunk.to_json(orient='records', lines=True).rstrip('\n') + '\n'
+                else:
+                    yield chunk.to_csv(index=False, header=header)
+                header = False
+                with metrics.stage('read_csv'):
+                    chunk = next(reader, None)
+                if chunk is not None:
+                    chunk = predict_chunk(chunk)
+        except Exception as e:
+            app.logger.warning("/predict/csv stream failed after %d rows: %s", rows, e)
+            metrics.STREAM_ERRORS.inc('predict_csv')
+            message = f"CSV processing error after {rows} rows: {e}"
+            if fmt == 'ndjson':
+                yield json.dumps({'error': message}) + '\n'
             else:
-                return 0
-
-        # Create tables
-        predictions_table = team_matches[['date', 'Opponent', 'Venue', 'Predicted_Team_Goals', 'Predicted_Opponent_Goals', 'Predicted_Outcome']]
-        predictions_table['Predicted_Score'] = predictions_table['Predicted_Team_Goals'].astype(str) + ' - ' + predictions_table['Predicted_Opponent_Goals'].astype(str)
-
-        actual_table = team_matches[['date', 'Opponent', 'Venue', 'Actual_Team_Goals', 'Actual_Opponent_Goals', 'Actual_Outcome']]
-        actual_table['Actual_Score'] = actual_table['Actual_Team_Goals'].astype(str) + ' - ' + actual_table['Actual_Opponent_Goals'].astype(str)
-
-        # Sort by date
-        predictions_table = predictions_table.sort_values(by='date').reset_index(drop=True)
-        actual_table = actual_table.sort_values(by='date').reset_index(drop=True)
-
-        # Format dates
-        predictions_table['date'] = pd.to_datetime(predictions_table['date']).dt.strftime('%Y-%m-%d')
-        actual_table['date'] = pd.to_datetime(actual_table['date']).dt.strftime('%Y-%m-%d')
-        
-        predictions_html = predictions_table[['date', 'Opponent', 'Venue', 'Predicted_Score', 'Predicted_Outcome']].to_html(classes="table table-striped", index=False)
-        actual_html = actual_table[['date', 'Opponent', 'Venue', 'Actual_Score', 'Actual_Outcome']].to_html(classes="table table-striped", index=False)
-
-    
-        
-        num_matches = len(team_matches)
-        actual_avg_team_goals = team_matches['Actual_Team_Goals'].mean()
-        actual_avg_opp_goals = team_matches['Actual_Opponent_Goals'].mean()
-        actual_record = team_matches['Actual_Outcome'].value_counts()
-        predicted_avg_team_goals = team_matches['Predicted_Team_Goals'].mean()
-        predicted_avg_opp_goals = team_matches['Predicted_Opponent_Goals'].mean()
-        predicted_record = team_matches['Predicted_Outcome'].value_counts()
-
-        # Calculate season scores
-        actual_points = team_matches['Actual_Outcome'].map({'Win': 3, 'Draw': 1, 'Loss': 0}).sum()
-        predicted_points = team_matches['Predicted_Outcome'].map({'Win': 3, 'Draw': 1, 'Loss': 0}).sum()
-
-        # Calculate metrics
-        mae_team = mean_absolute_error(team_matches['Actual_Team_Goals'], team_matches['Predicted_Team_Goals'])
-        mae_opp = mean_absolute_error(team_matches['Actual_Opponent_Goals'], team_matches['Predicted_Opponent_Goals'])
-        mse_team = mean_squared_error(team_matches['Actual_Team_Goals'], team_matches['Predicted_Team_Goals'])
-        mse_opp = mean_squared_error(team_matches['Actual_Opponent_Goals'], team_matches['Predicted_Opponent_Goals'])
-        rmse_team = np.sqrt(mse_team)
-        rmse_opp = np.sqrt(mse_opp)
-        r2_team = r2_score(team_matches['Actual_Team_Goals'], team_matches['Predicted_Team_Goals'])
-        r2_opp = r2_score(team_matches['Actual_Opponent_Goals'], team_matches['Predicted_Opponent_Goals'])
-
-        # Calculate outcome accuracy
-        correct_outcomes = (team_matches['Actual_Outcome'] == team_matches['Predicted_Outcome']).sum()
-        outcome_accuracy = (correct_outcomes / num_matches) * 100 if num_matches > 0 else 0
-
-        result = f"""
-        
-        <h3>Results for {team_name} ({num_matches} matches from {start_date} to {end_date})</h3>
-        <div style="display: flex; gap: 30px; flex-wrap: wrap;">
-            <div style="flex: 1; min-width: 300px;">
-                <h4>Actual Results</h4>
-                {actual_html}
-            </div>
-            <div style="flex: 1; min-width: 300px;">
-                <h4>Predicted Results</h4>
-                {predictions_html}
-            </div>
-        </div>
-
-        <hr>
-        
-        <h4>Actual Summary</h4>
-        
-        <ul>
-            <li>Average Goals Scored by Team: {actual_avg_team_goals:.2f}</li>
-            <li>Average Goals Conceded: {actual_avg_opp_goals:.2f}</li>
-            <li>Record (W-D-L): {actual_record.get('Win', 0)}-{actual_record.get('Draw', 0)}-{actual_record.get('Loss', 0)}</li>
-            <li>Season Score: {actual_points} points</li>
-         </ul>
-        <h4>Predicted Summary</h4>
-        
-        <ul>
-            <li>Average Goals Scored by Team: {predicted_avg_team_goals:.2f}</li>
-            <li>Average Goals Conceded: {predicted_avg_opp_goals:.2f}</li>
-            <li>Record (W-D-L): {predicted_record.get('Win', 0)}-{predicted_record.get('Draw', 0)}-{predicted_record.get('Loss', 0)}</li>
-            <li>Season Score: {predicted_points} points</li>
-        </ul>
-        
-        <h4>Model Performance Metrics</h4>
-        
-        <ul>
-            <li>Outcome Accuracy: {outcome_accuracy:.2f}%</li>
-        </ul>
-        """
-        # === END core logic === #
-
-    return render_template(
-        'index.html',
-        team_names=team_names,
-        team_name=team_name,
-        start_date=start_date,
-        end_date=end_date,
-        result=result
-    )
+                yield '# error: ' + ' '.join(message.split()) + '\n'
+        finally:
+            metrics.REQUEST_ROWS.observe(rows, 'predict_csv')
+
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'text/csv'
+    response = Response(generate(), mimetype=mimetype)
+    response.call_on_close(csvfile.close)
+    return response
+
+def team_key(team_id):
+    """
+    State key for a team id from JSON or a URL: integers and digit strings
+    both become int, so 7 and "7" are the same team. TypeError otherwise.
+    """
+    if isinstance(team_id, bool) or not isinstance(team_id, (int, str)):
+        raise TypeError(f"team_id must be a string or integer, not {type(team_id).__name__}")
+    if isinstance(team_id, str):
+        try:
+            return int(team_id)
+        except ValueError:
+            return team_id
+    return team_id
+
+@app.route('/predict/step', methods=['POST'])
+def predict_step():
+    # Stateful API: {"team_id": ..., "row": [...]} or {"updates": [{"team_id": ..., "row": [...]}, ...]}
+    # Each row is the team's newest match; returns the prediction given its whole history so far.
+    # States are per worker process (see TeamStateCache)
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="Expected a JSON object."), 400
+    updates = payload.get('updates', [payload])
+    try:
+        team_ids = [team_key(u['team_id']) for u in updates]
+        X = np.asarray([u['row'] for u in updates], dtype=np.float32)
+    except (KeyError, TypeError, ValueError):
+        return jsonify(error="Each update needs a 'team_id' (string or integer) and a 'row' of numbers."), 400
+    if X.ndim != 2 or X.shape[1] != INPUT_SIZE:
+        return jsonify(error=f"Rows must have {INPUT_SIZE} features."), 400
+    try:
+        check_finite(X)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    g.rows = len(X)
+    if len(X) > PREDICT_MAX_ROWS:
+        return jsonify(error=f"Batch of {len(X)} updates exceeds the limit of {PREDICT_MAX_ROWS}."), 413
+    preds = team_states().step(team_ids, preprocess(X))
+    return jsonify(predictions=preds.tolist())
+
+@app.route('/predict/step/<team_id>', methods=['DELETE'])
+def reset_team_state(team_id):
+    return jsonify(reset=team_states().reset(team_key(team_id)))
+
+@app.route('/predict/stats')
+def predict_stats():
+    return jsonify(batcher=batcher.stats(), cache=prediction_cache.stats(),
+                   team_states=team_states().stats(),
+                   season_table=season_table.stats() if season_table is not None else None)
+
+@app.route('/metrics')
+def metrics_text():
+    # Prometheus text format; histograms and counters are per worker process
+    extra = (metrics.gauge_lines('team_app_batcher', batcher.stats()) +
+             metrics.gauge_lines('team_app_prediction_cache', prediction_cache.stats()))
+    return Response(metrics.render(extra), mimetype='text/plain; version=0.0.4')
+
+# One profiled request at a time: cProfile cannot run in two threads at once on newer Pythons
+profile_lock = threading.Lock()
+
+@app.before_request
+def start_request():
+    g.started = time.perf_counter()
+    g.rows = None
+    g.profiler = None
+    if PROFILE_REQUESTS and request.args.get('profile') == '1' and profile_lock.acquire(blocking=False):
+        route = request.endpoint or 'unmatched'
+        g.profile_path = os.path.join(PROFILE_DIR, f"{route}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def finish_request(response):
+    route = request.endpoint or 'unmatched'
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.started, route)
+    metrics.REQUESTS.inc(route, str(response.status_code))
+    if response.status_code >= 400:
+        metrics.REQUEST_ERRORS.inc(route)
+    if g.rows is not None:
+        metrics.REQUEST_ROWS.observe(g.rows, route)
+    if g.profiler is not None:
+        response.headers['X-Profile'] = g.profile_path
+    return response
+
+@app.teardown_request
+def finish_profile(exc):
+    # Teardown also runs when the handler raised and after_request did not
+    # (app.run(debug=True) propagates errors), so the profiler always stops
+    # and the next ?profile=1 request can take the lock
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return
+    try:
+        # Handler thread only; the batched forward pass runs on the batcher's thread
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(g.profile_path)
+    finally:
+        profile_lock.release()
+
+def preload():
+    """
+    Load everything that is otherwise deferred to its first request (team
+    data, pandas, matplotlib, the recurrent model); serve.py calls this before
+    forking so workers share it.
+    """
+    import pandas
+    import matplotlib.figure
+    team_store().get()
+    try:
+        feature_cols()
+    except ValueError as e:
+        # /predict does not need them; team queries report the same error
+        app.logger.warning("Team season queries unavailable: %s", e)
+    team_states()
 
 if __name__ == '__main__':
     app.run(debug=True)
-'''
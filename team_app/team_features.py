@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+OUTCOMES = np.array(['Loss', 'Draw', 'Win'])
+POINTS = np.array([0, 1, 3])
+
+
+def paired_columns(columns):
+    """(home_col, away_col) pairs: columns that differ only by home/away (Home/Away)."""
+    columns = set(columns)
+    pairs = []
+    for col in sorted(columns):
+        if 'home' in col or 'Home' in col:
+            other = col.replace('home', 'away').replace('Home', 'Away')
+            if other in columns:
+                pairs.append((col, other))
+    return pairs
+
+
+def match_features(matches, feature_cols):
+    """
+    Model inputs for both teams of every match in `matches`, vectorized:
+    each home/away column pair is swapped as a whole block, not per row.
+    The model always reads features in home-team naming (feature_cols), so
+    X_home is the home team's view (as stored, is_home=1) and X_away puts the
+    away team in the "home" columns (is_home=0). Also returns the goals each
+    team scored, from the same swap.
+    """
+    pairs = paired_columns(matches.columns)
+    home_cols = [h for h, _ in pairs]
+    away_cols = [a for _, a in pairs]
+    H = matches[home_cols].to_numpy()
+    A = matches[away_cols].to_numpy()
+    n = len(matches)
+
+    def view(first, second, home_flag):
+        v = dict(zip(home_cols, first.T))
+        v.update(zip(away_cols, second.T))
+        v['is_home'] = np.full(n, home_flag, dtype=np.float32)
+        return v
+
+    def features(v):
+        cols = [v[c] if c in v else matches[c].to_numpy() for c in feature_cols]
+        return np.column_stack(cols).astype(np.float32) if cols else np.empty((n, 0), np.float32)
+
+    home_view = view(H, A, 1)
+    away_view = view(A, H, 0)
+    return (features(home_view), features(away_view),
+            home_view['home_team_goal'].astype(int), away_view['home_team_goal'].astype(int))
+
+
+def team_perspective(matches, team_id, feature_cols, team_names_by_id):
+    """
+    Rewrite `matches` (rows of match_df involving team_id) from the team's
+    point of view: X_team holds the team's inputs and X_opp the opponent's
+    (see match_features), picked per row with np.where on the venue mask.
+    Returns (table, X_team, X_opp) where table has date, Opponent, Venue,
+    Actual_Team_Goals and Actual_Opponent_Goals.
+    """
+    is_home = matches['home_team_api_id'].to_numpy() == team_id
+    X_home, X_away, home_goals, away_goals = match_features(matches, feature_cols)
+    mask = is_home[:, None]
+
+    opponent_ids = np.where(is_home, matches['away_team_api_id'].to_numpy(),
+                            matches['home_team_api_id'].to_numpy())
+    table = pd.DataFrame({
+        'date': matches['date'].to_numpy(),
+        'Opponent': [team_names_by_id.get(t) for t in opponent_ids],
+        'Venue': np.where(is_home, 'Home', 'Away'),
+        'Actual_Team_Goals': np.where(is_home, home_goals, away_goals),
+        'Actual_Opponent_Goals': np.where(is_home, away_goals, home_goals),
+    })
+    return table, np.where(mask, X_home, X_away), np.where(mask, X_away, X_home)
+
+
+def outcomes(team_goals, opponent_goals):
+    """Vectorized Win/Draw/Loss and league points for goal arrays."""
+    result = np.sign(np.asarray(team_goals) - np.asarray(opponent_goals)).astype(int) + 1
+    return OUTCOMES[result], POINTS[result]
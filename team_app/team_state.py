@@ -0,0 +1,70 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import torch
+
+
+class TeamStateCache:
+    """
+    Incremental PlayerRatingLSTM inference: keeps each team's LSTM (h, c)
+    after its latest match, so a new match costs one LSTM step instead of
+    re-running the team's whole history. The prediction returned by step()
+    equals model(full_history_including_this_row).
+    At most `max_teams` states are kept; the least recently updated team is
+    dropped first and restarts from a zero state on its next match. Eviction
+    runs after a whole step() call, so a team is never dropped between two of
+    its rows in the same call.
+    States live in this process only: under serve.py each worker has its own
+    cache, so one team's consecutive requests must reach the same worker
+    (or the server run with --workers 1) to continue the same history.
+    """
+    def __init__(self, model, max_teams=10000):
+        self.model = model
+        self.max_teams = max_teams
+        self._states = OrderedDict()   # team_id -> (h, c), each (num_layers, hidden_size)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def step(self, team_ids, X):
+        """
+        Advance each team in `team_ids` by its row of X (n, input_size, already
+        preprocessed) and return (n,) float32 predictions. A team may appear
+        more than once; its rows are applied in order.
+        """
+        team_ids = list(team_ids)
+        X = torch.as_tensor(np.asarray(X, dtype=np.float32))
+        preds = np.empty(len(team_ids), dtype=np.float32)
+        # Rows for distinct teams advance together as one batch; repeats go in later rounds
+        pending = list(range(len(team_ids)))
+        with self._lock, torch.no_grad():
+            while pending:
+                batch, seen, later = [], set(), []
+                for i in pending:
+                    (later if team_ids[i] in seen else batch).append(i)
+                    seen.add(team_ids[i])
+                preds[batch] = self._advance([team_ids[i] for i in batch], X[batch])
+                pending = later
+            while len(self._states) > self.max_teams:
+                self._states.popitem(last=False)
+                self.evictions += 1
+        return preds
+
+    def _advance(self, teams, X):
+        lstm = self.model.lstm
+        zeros = torch.zeros(lstm.num_layers, lstm.hidden_size)
+        prev = [self._states.get(t, (zeros, zeros)) for t in teams]
+        h0 = torch.stack([h for h, _ in prev], dim=1)      # (num_layers, batch, hidden)
+        c0 = torch.stack([c for _, c in prev], dim=1)
+        out, (h, c) = lstm(X.unsqueeze(1), (h0, c0))
+        for k, t in enumerate(teams):
+            self._states[t] = (h[:, k].clone(), c[:, k].clone())
+            self._states.move_to_end(t)
+        return self.model.fc(out[:, -1]).reshape(-1).numpy()
+
+    def reset(self, team_id):
+        with self._lock:
+            return self._states.pop(team_id, None) is not None
+
+    def stats(self):
+        with self._lock:
+            return dict(teams=len(self._states), max_teams=self.max_teams, evictions=self.evictions)
@@ -0,0 +1,115 @@
+import os
+import pickle
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+
+class TeamData:
+    """
+    Read-only snapshot of team.pkl with the lookups the app needs precomputed.
+    team_names:     sorted team_long_name of every team that played a match
+    team_ids:       team_long_name -> team_api_id
+    team_names_by_id: team_api_id -> team_long_name
+    matches_by_team: team_api_id -> int array of match_df row positions, sorted by date
+    dates_by_team:   team_api_id -> datetime64 array of those matches' dates (sorted),
+                     so a date range is two binary searches (team_matches_between)
+    """
+    def __init__(self, team_df, match_df, mtime):
+        self.team_df = team_df
+        self.match_df = match_df
+        self.mtime = mtime
+
+        home = match_df['home_team_api_id'].to_numpy()
+        away = match_df['away_team_api_id'].to_numpy()
+        ids = pd.unique(np.concatenate([home, away]))
+
+        playing = team_df[team_df['team_api_id'].isin(ids)]
+        self.team_names = sorted(playing['team_long_name'].unique())
+        self.team_ids = dict(zip(playing['team_long_name'], playing['team_api_id']))
+        self.team_names_by_id = dict(zip(team_df['team_api_id'], team_df['team_long_name']))
+
+        # Dates are parsed once here, not compared as strings per request
+        dates = pd.to_datetime(match_df['date']).to_numpy()
+
+        # Every match appears under both of its teams; one lexsort groups them
+        # by team and orders each team's matches by date
+        team_col = np.concatenate([home, away])
+        rows = np.concatenate([np.arange(len(home)), np.arange(len(away))])
+        order = np.lexsort((rows, dates[rows], team_col))
+        team_col, rows = team_col[order], rows[order]
+        starts = np.flatnonzero(np.r_[True, team_col[1:] != team_col[:-1]])
+        ends = np.r_[starts[1:], len(team_col)]
+        self.matches_by_team = {
+            team_col[s]: rows[s:e] for s, e in zip(starts, ends)
+        }
+        self.dates_by_team = {
+            t: dates[r] for t, r in self.matches_by_team.items()
+        }
+
+    def team_matches(self, team_id):
+        """Rows of match_df involving team_id, in date order."""
+        rows = self.matches_by_team.get(team_id)
+        if rows is None:
+            return self.match_df.iloc[0:0]
+        return self.match_df.iloc[rows]
+
+    def team_match_rows(self, team_id, start=None, end=None):
+        """
+        match_df row positions of team_id's matches dated start .. end
+        (inclusive; end covers its whole day). Empty or None bounds are open.
+        """
+        rows = self.matches_by_team.get(team_id)
+        if rows is None:
+            return np.empty(0, dtype=np.int64)
+        dates = self.dates_by_team[team_id]
+        lo = 0
+        hi = len(dates)
+        if start:
+            lo = np.searchsorted(dates, np.datetime64(pd.Timestamp(start).normalize()), side='left')
+        if end:
+            day_after = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+            hi = np.searchsorted(dates, np.datetime64(day_after), side='left')
+        return rows[lo:max(lo, hi)]
+
+    def team_matches_between(self, team_id, start=None, end=None):
+        """team_matches(team_id) restricted to a date range, without scanning match_df."""
+        return self.match_df.iloc[self.team_match_rows(team_id, start, end)]
+
+
+class TeamStore:
+    """
+    Loads team.pkl once and hands out the shared TeamData snapshot.
+    get() re-checks the file's mtime at most every `check_interval` seconds
+    and swaps in a fresh snapshot when the file has changed on disk.
+    """
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._data = None
+        self._last_check = 0.0
+        self._load()
+
+    def _load(self):
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, 'rb') as f:
+            td = pickle.load(f)
+        self._data = TeamData(td['team_df'], td['match_df'], mtime)
+
+    def get(self, recheck=False):
+        """The current snapshot; recheck=True looks at the file now, not once per check_interval."""
+        now = time.monotonic()
+        if not recheck and now - self._last_check < self.check_interval:
+            return self._data
+        with self._lock:
+            if recheck or now - self._last_check >= self.check_interval:
+                self._last_check = now
+                try:
+                    if os.path.getmtime(self.path) != self._data.mtime:
+                        self._load()
+                except (OSError, EOFError, pickle.UnpicklingError):
+                    # Keep serving the last good snapshot if the file is mid-rewrite
+                    pass
+        return self._data
@@ -0,0 +1,100 @@
+import os
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'team_app')]
+
+from playernn import PlayerRatingLSTM
+
+INPUT_SIZE = 40
+N_PAIRS = 19
+# 19 home/away pairs + is_home + one unpaired column = the server's 40 inputs
+FEATURE_COLS = ([f'home_f{i}' for i in range(N_PAIRS)] + [f'away_f{i}' for i in range(N_PAIRS)] +
+                ['is_home', 'neutral'])
+
+
+def make_model(input_size=INPUT_SIZE, seed=0, **kwargs):
+    torch.manual_seed(seed)
+    return PlayerRatingLSTM(input_size=input_size, **kwargs).eval()
+
+
+def make_matches(n_teams=6, n_matches=80, seed=0):
+    """Synthetic (team_df, match_df) in the team.pkl layout, with some same-day matches."""
+    rng = np.random.default_rng(seed)
+    team_ids = np.arange(100, 100 + n_teams)
+    team_df = pd.DataFrame({'team_api_id': team_ids, 'team_long_name': [f'Team {t}' for t in team_ids]})
+    home = rng.choice(team_ids, n_matches)
+    away = np.array([rng.choice(team_ids[team_ids != h]) for h in home])
+    days = pd.Timestamp('2010-08-01') + pd.to_timedelta(rng.integers(0, 300, n_matches), unit='D')
+    hours = pd.to_timedelta(rng.integers(12, 21, n_matches), unit='h')
+    match_df = pd.DataFrame({
+        'home_team_api_id': home,
+        'away_team_api_id': away,
+        'date': (days + hours).strftime('%Y-%m-%d %H:%M:%S'),
+        'season': '2010/2011',
+        'home_team_goal': rng.integers(0, 5, n_matches),
+        'away_team_goal': rng.integers(0, 5, n_matches),
+        'neutral': rng.integers(0, 2, n_matches).astype(float),
+    })
+    for i in range(N_PAIRS):
+        match_df[f'home_f{i}'] = rng.normal(size=n_matches)
+        match_df[f'away_f{i}'] = rng.normal(size=n_matches)
+    return team_df, match_df
+
+
+@pytest.fixture
+def model():
+    return make_model()
+
+
+@pytest.fixture
+def matches():
+    return make_matches()
+
+
+@pytest.fixture(scope='session')
+def app_dir(tmp_path_factory):
+    """Working directory with the artifacts server.py loads: weights, scaler, team.pkl, attributes.txt."""
+    from sklearn.preprocessing import StandardScaler
+    path = tmp_path_factory.mktemp('app')
+    torch.save(make_model(seed=1).state_dict(), path / 'player_nn_model_weights.pth')
+    rng = np.random.default_rng(1)
+    scaler = StandardScaler().fit(rng.normal(2.0, 3.0, size=(500, INPUT_SIZE)))
+    with open(path / 'scaler.pkl', 'wb') as f:
+        pickle.dump(scaler, f)
+    team_df, match_df = make_matches()
+    with open(path / 'team.pkl', 'wb') as f:
+        pickle.dump({'team_df': team_df, 'match_df': match_df}, f)
+    (path / 'attributes.txt').write_text('\n'.join(FEATURE_COLS) + '\n')
+    return path
+
+
+@pytest.fixture(scope='session')
+def server(app_dir):
+    """The Flask app module, imported with app_dir as the working directory."""
+    cwd = os.getcwd()
+    os.chdir(app_dir)
+    env = {'INFERENCE_MODE': 'fused', 'WARMUP_RUNS': '1', 'PREDICT_CACHE_ROWS': '1000', 'SEASON_TABLE': ''}
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        import server as module
+        yield module
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
@@ -0,0 +1,102 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from batcher import MicroBatcher
+
+
+def test_stats_before_the_first_request_are_complete():
+    stats = MicroBatcher(lambda X: X.sum(axis=1)).stats()
+    assert 'queue_wait_s' not in stats and 'max_queue_wait_s' not in stats
+    assert stats['mean_queue_wait_ms'] == 0.0 and stats['max_queue_wait_ms'] == 0.0
+
+
+def test_concurrent_requests_get_their_own_rows_back():
+    batcher = MicroBatcher(lambda X: X.sum(axis=1), max_rows=64, max_wait_ms=20)
+    inputs = [np.full((n, 3), float(n)) for n in range(1, 9)]
+    results = [None] * len(inputs)
+
+    def call(i):
+        results[i] = batcher.submit(inputs[i])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(inputs))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for X, out in zip(inputs, results):
+        assert np.array_equal(out, X.sum(axis=1))
+    stats = batcher.stats()
+    assert stats['requests'] == len(inputs)
+    assert stats['rows'] == sum(len(X) for X in inputs)
+
+
+def queued_behind_a_blocked_batch(fn, inputs, **kwargs):
+    """
+    Submit inputs in order while the worker is busy on a first batch, so
+    they are all waiting when it collects the next batch. Returns
+    (batcher, results or exceptions, rows per fn call after the first).
+    """
+    gate = threading.Event()
+    calls = []
+
+    def gated(X):
+        if not calls:
+            gate.wait()
+        calls.append(len(X))
+        return fn(X)
+
+    batcher = MicroBatcher(gated, **kwargs)
+    results = [None] * len(inputs)
+
+    def call(i, X):
+        try:
+            results[i] = batcher.submit(X)
+        except Exception as e:
+            results[i] = e
+
+    # A full first batch, so the worker runs it at once
+    threads = [threading.Thread(target=call, args=(-1, np.zeros((batcher.max_rows, 3))))]
+    threads[0].start()
+    while batcher._queue.qsize() or not batcher._worker.is_alive():
+        time.sleep(0.001)
+    for i, X in enumerate(inputs):
+        threads.append(threading.Thread(target=call, args=(i, X)))
+        threads[-1].start()
+        while batcher._queue.qsize() < i + 1:
+            time.sleep(0.001)
+    gate.set()
+    for t in threads:
+        t.join()
+    return batcher, results[:len(inputs)], calls[1:]
+
+
+def test_a_request_that_overflows_the_batch_runs_on_its_own():
+    inputs = [np.ones((10, 3)), np.ones((600, 3)), np.ones((10, 3)), np.ones((20, 3))]
+    _, results, calls = queued_behind_a_blocked_batch(lambda X: X.sum(axis=1), inputs,
+                                                      max_rows=64, max_wait_ms=200)
+    assert calls == [10, 600, 30]
+    for X, out in zip(inputs, results):
+        assert np.array_equal(out, X.sum(axis=1))
+
+
+def test_a_failing_request_does_not_fail_its_batch():
+    def fn(X):
+        if np.isnan(X).any():
+            raise ValueError("NaN input")
+        return X.sum(axis=1)
+    inputs = [np.ones((2, 3)), np.full((1, 3), np.nan), np.ones((3, 3))]
+    _, results, _ = queued_behind_a_blocked_batch(fn, inputs, max_rows=64, max_wait_ms=200)
+    assert np.array_equal(results[0], [3.0, 3.0])
+    assert isinstance(results[1], ValueError)
+    assert np.array_equal(results[2], [3.0, 3.0, 3.0])
+
+
+def test_errors_reach_the_caller():
+    def fail(X):
+        raise RuntimeError("model failed")
+    batcher = MicroBatcher(fail)
+    with pytest.raises(RuntimeError, match="model failed"):
+        batcher.submit(np.zeros((1, 3)))
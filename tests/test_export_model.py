@@ -0,0 +1,33 @@
+import os
+import shutil
+import subprocess
+import sys
+
+from conftest import ROOT
+
+IMPORT_SERVER = "import server; print(server.INFERENCE_MODE)"
+
+
+def run(args, cwd, **env):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.path.join(ROOT, 'team_app')]), **env)
+    return subprocess.run([sys.executable, *args], cwd=cwd, env=env, check=True, capture_output=True,
+                          text=True)
+
+
+def test_server_warns_about_a_stale_export(app_dir, tmp_path):
+    shutil.copytree(app_dir, tmp_path, dirs_exist_ok=True)
+    run([os.path.join(ROOT, 'team_app', 'export_model.py')], tmp_path)
+    env = dict(INFERENCE_MODE='scripted', WARMUP_RUNS='1', SEASON_TABLE='')
+    fresh = run(['-c', IMPORT_SERVER], tmp_path, **env)
+    assert 'stale' not in fresh.stderr
+
+    weights = tmp_path / 'player_nn_model_weights.pth'
+    stat = weights.stat()
+    os.utime(weights, (stat.st_atime, stat.st_mtime + 10))
+    stale = run(['-c', IMPORT_SERVER], tmp_path, **env)
+    assert 'player_nn_model_scripted.pt is stale' in stale.stderr
+
+    # Served from the export alone: nothing to compare with
+    weights.unlink()
+    alone = run(['-c', IMPORT_SERVER], tmp_path, **env)
+    assert 'stale' not in alone.stderr and alone.stdout.strip() == 'scripted'
@@ -0,0 +1,26 @@
+from metrics import Counter, Histogram, gauge_lines
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram('t_seconds', "help", ['stage'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        h.observe(value, 'a')
+    lines = h.render()
+    assert 't_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="a",le="1.0"} 3' in lines
+    assert 't_seconds_bucket{stage="a",le="+Inf"} 4' in lines
+    assert 't_seconds_count{stage="a"} 4' in lines
+    assert 't_seconds_sum{stage="a"} 4.05' in lines
+
+
+def test_counter_escapes_label_values():
+    c = Counter('t_total', "help", ['route'])
+    c.inc('a"b\\c')
+    c.inc('a"b\\c', amount=2)
+    assert c.render()[-1] == 't_total{route="a\\"b\\\\c"} 3'
+
+
+def test_gauge_lines_skip_non_numeric_stats():
+    lines = gauge_lines('t', {'size': 3, 'hit_rate': 0.5, 'fresh': True, 'path': 'x'})
+    assert 't_size 3' in lines and 't_hit_rate 0.5' in lines
+    assert not any(line.startswith(('t_fresh', 't_path')) for line in lines)
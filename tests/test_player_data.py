@@ -0,0 +1,63 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+import torch
+
+from player_data import MANIFEST, convert_pickle, load_arrays, open_dataset, pad_histories, write_dataset
+
+
+@pytest.fixture
+def arrays():
+    rng = np.random.default_rng(0)
+    return {
+        'X_train': rng.normal(size=(30, 1, 5)).astype(np.float32),
+        'y_train': rng.normal(size=30).astype(np.float32),
+        'X_val': torch.randn(8, 1, 5),
+        'y_val': None,
+    }
+
+
+def test_write_and_open_round_trip(tmp_path, arrays):
+    write_dataset(tmp_path, arrays, feature_cols=list('abcde'), sequence_length=1)
+    opened, manifest = open_dataset(tmp_path)
+    assert set(opened) == {'X_train', 'y_train', 'X_val'}
+    assert isinstance(opened['X_train'], np.memmap)
+    assert np.array_equal(opened['X_train'], arrays['X_train'])
+    assert np.array_equal(opened['X_val'], arrays['X_val'].numpy())
+    assert manifest['feature_cols'] == list('abcde') and manifest['sequence_length'] == 1
+    assert manifest['arrays']['y_train'] == {'file': 'y_train.npy', 'shape': [30], 'dtype': 'float32'}
+
+
+def test_open_rejects_a_file_that_disagrees_with_the_manifest(tmp_path, arrays):
+    write_dataset(tmp_path, arrays)
+    np.save(tmp_path / 'y_train.npy', np.zeros(3, np.float32))
+    with pytest.raises(ValueError, match='y_train'):
+        open_dataset(tmp_path)
+
+
+def test_convert_pickle_matches_the_bundle(tmp_path, arrays):
+    bundle = dict(arrays, X_val=arrays['X_val'].numpy(), feature_cols=list('abcde'), sequence_length=1,
+                  model_state=None)
+    with open(tmp_path / 'bundle.pkl', 'wb') as f:
+        pickle.dump(bundle, f)
+    convert_pickle(tmp_path / 'bundle.pkl', tmp_path / 'data')
+    assert os.path.exists(tmp_path / 'data' / MANIFEST)
+    from_dir = load_arrays(str(tmp_path / 'data'))
+    from_pickle = load_arrays(str(tmp_path / 'bundle.pkl'))
+    for name in ('X_train', 'y_train', 'X_val'):
+        assert np.array_equal(from_dir[name], from_pickle[name])
+        assert np.array_equal(from_dir[name], bundle[name])
+    assert from_dir['y_val'] is None and from_pickle['y_val'] is None
+    assert open_dataset(tmp_path / 'data')[1]['feature_cols'] == list('abcde')
+
+
+def test_pad_histories_zero_fills_past_each_length():
+    steps = np.arange(6 * 2, dtype=np.float32).reshape(6, 2)
+    X, lengths = pad_histories(steps, starts=[0, 1, 4], lengths=[1, 3, 2])
+    assert X.shape == (3, 3, 2)
+    assert lengths.tolist() == [1, 3, 2]
+    assert torch.equal(X[1], torch.as_tensor(steps[1:4]))
+    assert torch.equal(X[2, :2], torch.as_tensor(steps[4:6]))
+    assert not X[0, 1:].any() and not X[2, 2:].any()
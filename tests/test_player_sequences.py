@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from player_sequences import build_histories, build_sequences
+
+FEATURES = ['a', 'b', 'c']
+
+
+@pytest.fixture
+def players():
+    rng = np.random.default_rng(0)
+    n = 200
+    df = pd.DataFrame(rng.normal(size=(n, 3)), columns=FEATURES)
+    # Unsorted player ids with 1..~15 records each, including single-record players
+    ids = [5, 3, 11, 8, 2, 40, 17, 9, 30, 21, 99]
+    df['player_api_id'] = rng.choice(ids, n, p=[.2, .2, .1, .1, .1, .1, .1, .04, .03, .02, .01])
+    df['overall_rating'] = rng.normal(60, 10, n)
+    return df
+
+
+def legacy_sequences(df, L):
+    """The per-player loop build_sequences replaced"""
+    X, y, groups = [], [], []
+    for player, g in df.groupby('player_api_id'):
+        F = g[FEATURES].to_numpy(dtype=np.float32)
+        target = g['overall_rating'].to_numpy(dtype=np.float32)
+        for i in range(len(g) - L):
+            X.append(F[i:i + L])
+            y.append(target[i + L])
+            groups.append(player)
+    return (np.array(X, dtype=np.float32).reshape(-1, L, len(FEATURES)),
+            np.array(y, dtype=np.float32), np.array(groups))
+
+
+@pytest.mark.parametrize('L', [1, 3, 6])
+@pytest.mark.parametrize('n_jobs', [1, 4])
+def test_build_sequences_matches_groupby_loop(players, L, n_jobs):
+    X, y, groups = build_sequences(players, FEATURES, sequence_length=L, n_jobs=n_jobs)
+    X_ref, y_ref, groups_ref = legacy_sequences(players, L)
+    assert X.dtype == np.float32 and X.shape == X_ref.shape
+    assert np.array_equal(X, X_ref)
+    assert np.array_equal(y, y_ref)
+    assert np.array_equal(groups, groups_ref)
+
+
+def test_lazy_windows_match_materialized(players):
+    X, _, _ = build_sequences(players, FEATURES, sequence_length=3)
+    lazy, _, _ = build_sequences(players, FEATURES, sequence_length=3, lazy=True)
+    assert lazy.shape == X.shape
+    assert np.array_equal(np.asarray(lazy), X)
+    idx = np.array([5, 0, len(X) - 1])
+    assert np.array_equal(lazy[idx], X[idx])
+
+
+def test_build_sequences_longer_than_every_player(players):
+    X, y, groups = build_sequences(players, FEATURES, sequence_length=len(players))
+    assert X.shape == (0, len(players), len(FEATURES)) and len(y) == len(groups) == 0
+
+
+@pytest.mark.parametrize('max_length,min_length', [(None, 1), (4, 1), (2, 3)])
+def test_build_histories_matches_groupby_loop(players, max_length, min_length):
+    steps, starts, lengths, y, groups = build_histories(players, FEATURES, max_length=max_length,
+                                                        min_length=min_length)
+    expected = []
+    for player, g in players.groupby('player_api_id'):
+        F = g[FEATURES].to_numpy(dtype=np.float32)
+        target = g['overall_rating'].to_numpy(dtype=np.float32)
+        for i in range(min_length, len(g)):
+            first = 0 if max_length is None else max(0, i - max_length)
+            expected.append((F[first:i], target[i], player))
+    assert len(starts) == len(expected)
+    for s, n, target, group, (history, ref_target, player) in zip(starts, lengths, y, groups, expected):
+        assert np.array_equal(steps[s:s + n], history)
+        assert target == ref_target and group == player
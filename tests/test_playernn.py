@@ -0,0 +1,81 @@
+import copy
+
+import numpy as np
+import pytest
+import torch
+
+from conftest import INPUT_SIZE, make_model
+from player_data import SequenceDataset
+from playernn import check_fast_inference, fold_input_scaler, quantize_int8
+
+
+def test_fast_inference_matches_lstm(model):
+    fast = model.to_fast_inference(verify=False)
+    assert check_fast_inference(model, fast) < 1e-5
+
+
+def test_numpy_export_matches_lstm(model):
+    numpy_model = model.to_fast_inference(verify=False).to_numpy()
+    assert check_fast_inference(model, numpy_model) < 1e-5
+
+
+def test_fast_inference_accepts_2d_and_3d_inputs(model):
+    fast = model.to_fast_inference()
+    X = torch.randn(8, INPUT_SIZE)
+    with torch.no_grad():
+        assert torch.equal(fast(X), fast(X.unsqueeze(1)))
+
+
+def test_fast_inference_refuses_multi_step_inputs(model):
+    # A (n, L > 1, F) history must not be run as its last step from zero state
+    fast = model.to_fast_inference()
+    X = torch.randn(4, 3, INPUT_SIZE)
+    with pytest.raises(ValueError, match='length 3'):
+        fast(X)
+    with pytest.raises(ValueError, match='length 3'):
+        fast.to_numpy()(X.numpy())
+    with pytest.raises(torch.jit.Error, match='length 3'):
+        torch.jit.script(fast)(X)
+
+
+def test_fast_inference_rejects_a_mismatched_export(monkeypatch):
+    import playernn
+    model = make_model(hidden_size=16, num_layers=1, dropout=0.0)
+    monkeypatch.setattr(playernn, 'check_fast_inference', lambda m, f: 1.0)
+    with pytest.raises(ValueError, match='differs'):
+        model.to_fast_inference()
+
+
+def test_fold_input_scaler_matches_scaling_the_inputs(model):
+    rng = np.random.default_rng(0)
+    mean = rng.normal(3.0, 2.0, INPUT_SIZE)
+    scale = rng.uniform(0.5, 4.0, INPUT_SIZE)
+    X = torch.as_tensor(rng.normal(mean, scale, (16, 3, INPUT_SIZE)), dtype=torch.float32)
+    folded = fold_input_scaler(copy.deepcopy(model), mean, scale)
+    Xs = (X - torch.as_tensor(mean, dtype=torch.float32)) / torch.as_tensor(scale, dtype=torch.float32)
+    with torch.no_grad():
+        assert torch.allclose(folded(X), model(Xs), atol=1e-5)
+
+
+def test_packed_batch_matches_each_sequence_alone(model):
+    rng = np.random.default_rng(0)
+    lengths = np.array([3, 1, 7, 4, 7])
+    starts = np.r_[0, np.cumsum(lengths)[:-1]]
+    steps = rng.normal(size=(lengths.sum(), INPUT_SIZE)).astype(np.float32)
+    dataset = SequenceDataset(steps, starts, lengths, np.zeros(len(lengths)))
+    X, _, packed_lengths = dataset.__getitems__(range(len(lengths)))
+    with torch.no_grad():
+        packed = model(X, packed_lengths).reshape(-1)
+        alone = torch.cat([model(torch.as_tensor(steps[s:s + n]).unsqueeze(0)).reshape(-1)
+                           for s, n in zip(starts, lengths)])
+    assert torch.allclose(packed, alone, atol=1e-5)
+
+
+def test_quantize_int8_is_close_and_leaves_model_untouched(model):
+    before = copy.deepcopy(model.state_dict())
+    quantized = quantize_int8(model)
+    X = torch.randn(64, 1, INPUT_SIZE)
+    with torch.no_grad():
+        assert (quantized(X) - model(X)).abs().max().item() < 2e-2
+    for name, tensor in model.state_dict().items():
+        assert torch.equal(tensor, before[name])
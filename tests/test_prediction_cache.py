@@ -0,0 +1,50 @@
+import numpy as np
+
+from prediction_cache import PredictionCache
+
+
+def model(X):
+    return X.sum(axis=1).astype(np.float32)
+
+
+def test_cached_predictions_equal_the_model():
+    rng = np.random.default_rng(0)
+    cache = PredictionCache(max_rows=100)
+    X = rng.normal(size=(20, 4)).astype(np.float32)
+    assert np.array_equal(cache.predict(X, model), model(X))
+    # Repeats and a reordering are served from the cache
+    again = np.vstack([X[::-1], X[:5]])
+    calls = []
+    out = cache.predict(again, lambda rows: calls.append(len(rows)) or model(rows))
+    assert np.array_equal(out, model(again))
+    assert calls == []
+    assert cache.stats()['hits'] == len(again)
+
+
+def test_only_distinct_missing_rows_reach_the_model():
+    cache = PredictionCache(max_rows=100)
+    X = np.repeat(np.eye(3, dtype=np.float32), 4, axis=0)
+    seen = []
+    cache.predict(X, lambda rows: seen.append(rows) or model(rows))
+    assert len(seen) == 1 and len(seen[0]) == 3
+
+
+def test_least_recently_used_rows_are_evicted():
+    cache = PredictionCache(max_rows=2)
+    rows = np.eye(3, dtype=np.float32)
+    for i in range(3):
+        cache.predict(rows[i:i + 1], model)
+    stats = cache.stats()
+    assert stats['size'] == 2 and stats['evictions'] == 1
+    seen = []
+    cache.predict(rows[:1], lambda r: seen.append(len(r)) or model(r))
+    assert seen == [1]
+
+
+def test_disabled_cache_calls_the_model_every_time():
+    cache = PredictionCache(max_rows=0)
+    X = np.ones((2, 3), dtype=np.float32)
+    seen = []
+    cache.predict(X, lambda r: seen.append(len(r)) or model(r))
+    cache.predict(X, lambda r: seen.append(len(r)) or model(r))
+    assert seen == [2, 2]
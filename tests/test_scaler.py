@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from conftest import ROOT
+from scaler import merge_moments, scaler_from_moments, scaler_moments, streaming_moments
+
+
+@pytest.fixture
+def rows():
+    rng = np.random.default_rng(0)
+    X = rng.normal(50.0, 10.0, size=(1003, 6))
+    X[:, 2] = 7.0   # constant feature: left unscaled
+    return X
+
+
+def assert_same_scaler(got, expected):
+    assert got.n_samples_seen_ == expected.n_samples_seen_
+    assert np.allclose(got.mean_, expected.mean_, rtol=1e-12)
+    assert np.allclose(got.var_, expected.var_, rtol=1e-10)
+    assert np.allclose(got.scale_, expected.scale_, rtol=1e-10)
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_streamed_fit_matches_standard_scaler(rows, workers):
+    scaler = scaler_from_moments(streaming_moments(rows, chunk_rows=97, workers=workers))
+    expected = StandardScaler().fit(rows)
+    assert_same_scaler(scaler, expected)
+    assert np.allclose(scaler.transform(rows), expected.transform(rows))
+
+
+def test_merging_new_rows_matches_a_refit(rows):
+    old = StandardScaler().fit(rows[:600])
+    merged = merge_moments(scaler_moments(old), streaming_moments(rows[600:], chunk_rows=50))
+    assert_same_scaler(scaler_from_moments(merged), StandardScaler().fit(rows))
+
+
+def test_update_command_folds_new_rows_into_scaler_pkl(tmp_path, rows):
+    np.save(tmp_path / 'old.npy', rows[:600])
+    np.save(tmp_path / 'new.npy', rows[600:])
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    script = os.path.join(ROOT, 'team_app', 'scaler.py')
+    for args in (['--data', 'old.npy'], ['--update', 'new.npy', '--chunk-rows', '64']):
+        subprocess.run([sys.executable, script, *args], cwd=tmp_path, env=env, check=True,
+                       capture_output=True)
+    assert_same_scaler(joblib.load(tmp_path / 'scaler.pkl'), StandardScaler().fit(rows))
@@ -0,0 +1,153 @@
+import fcntl
+import os
+import sqlite3
+import time
+
+import pandas as pd
+import pytest
+import torch
+
+from artifacts import file_version
+from season_table import COLUMNS, SeasonTable, season_rows, table_version, write_table
+
+
+@pytest.fixture
+def sources(tmp_path):
+    path = tmp_path / 'weights'
+    path.write_text('v1')
+    return (str(path),)
+
+
+def built_table(tmp_path, sources, rows, rebuild=None):
+    path = str(tmp_path / 'season.sqlite')
+    write_table(path, rows, file_version(*sources))
+    table = SeasonTable(path, lambda: file_version(*sources), rebuild or (lambda p, v: write_table(p, rows, v)),
+                        check_interval=3600)
+    # Checks are driven by the tests, not by the refresh thread
+    table._worker_pid = os.getpid()
+    return table
+
+
+def test_table_matches_live_season_results(server, tmp_path, sources):
+    td = server.team_store().get()
+    rows = season_rows(td, server.feature_cols(), server.predict_rows)
+    table = built_table(tmp_path, sources, rows)
+    for team_id in td.matches_by_team:
+        for start, end in [(None, None), ('2010-09-01', '2011-01-31'), ('2011-03-01', '2011-03-01')]:
+            live = server.live_season_table(td, team_id, start, end)
+            stored = table.query(team_id, start, end)
+            if live is None:
+                assert stored.empty
+                continue
+            live['date'] = pd.to_datetime(live['date']).dt.strftime('%Y-%m-%d')
+            cols = [c for c in COLUMNS if c in live.columns]
+            assert stored[cols].astype(str).equals(live[cols].reset_index(drop=True).astype(str)), team_id
+
+
+def test_rebuild_uses_the_served_model(server, tmp_path, monkeypatch):
+    # Another model in memory than the weights on disk, as after a weights
+    # update without a restart: the table must still agree with live answers
+    from conftest import make_model
+    from prediction_cache import PredictionCache
+    served = make_model(seed=7).to_fast_inference()
+    with torch.no_grad():
+        served.fc.bias += 2.6   # predictions far from the model on disk
+    monkeypatch.setattr(server, 'model', served)
+    monkeypatch.setattr(server, 'prediction_cache', PredictionCache(0))
+    path = str(tmp_path / 'season.sqlite')
+    server.rebuild_season_table(path, server.season_table_version())
+    table = SeasonTable(path, server.season_table_version, None, check_interval=3600)
+    table._worker_pid = os.getpid()
+    td = server.team_store().get()
+    for team_id in td.matches_by_team:
+        live = server.live_season_table(td, team_id, None, None)
+        stored = table.query(team_id)
+        assert stored['Predicted_Team_Goals'].tolist() == live['Predicted_Team_Goals'].tolist()
+        assert stored['Predicted_Opponent_Goals'].tolist() == live['Predicted_Opponent_Goals'].tolist()
+        assert (live['Predicted_Team_Goals'] > 0).all()
+    assert server.season_table_version().startswith(server.MODEL_VERSION)
+
+
+def test_query_returns_none_once_sources_change(tmp_path, sources):
+    rows = pd.DataFrame({c: [] for c in COLUMNS})
+    table = built_table(tmp_path, sources, rows)
+    assert table.query(1) is not None
+    time.sleep(0.01)
+    with open(sources[0], 'w') as f:
+        f.write('v2 with a different size')
+    table._check()
+    assert table.query(1) is None
+    table._check(rebuild=True)
+    assert table.query(1) is not None
+    assert table.stats()['rebuilds'] == 1
+
+
+def test_table_version_of_a_missing_table_is_none(tmp_path):
+    assert table_version(str(tmp_path / 'missing.sqlite')) is None
+
+
+def test_fork_during_rebuild_does_not_keep_the_lock(tmp_path, sources):
+    # A process forked while the rebuild lock is held must not hold it after
+    # the parent's rebuild is done
+    children = []
+
+    def rebuild(path, version):
+        pid = os.fork()
+        if pid == 0:
+            time.sleep(2)
+            os._exit(0)
+        children.append(pid)
+        write_table(path, pd.DataFrame({c: [] for c in COLUMNS}), version)
+
+    path = str(tmp_path / 'season.sqlite')
+    table = SeasonTable(path, lambda: file_version(*sources), rebuild, check_interval=3600)
+    table._check(rebuild=True)
+    fd = os.open(path + '.lock', os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    finally:
+        os.close(fd)
+        for pid in children:
+            os.waitpid(pid, 0)
+    assert table.stats()['fresh']
+
+
+@pytest.fixture
+def team_pkl(server, tmp_path, monkeypatch, matches):
+    """A private team.pkl behind server.team_store(), re-checked only once an hour"""
+    from team_store import TeamStore
+    path = tmp_path / 'team.pkl'
+    pd.to_pickle({'team_df': matches[0], 'match_df': matches[1]}, path)
+    store = TeamStore(str(path), check_interval=3600)
+    monkeypatch.setattr(server, 'TEAM_DATA_PATH', str(path))
+    monkeypatch.setattr(server, 'team_store', lambda: store)
+    return path
+
+
+def rewrite(path, match_df, mtime):
+    team_df = pd.read_pickle(path)['team_df']
+    pd.to_pickle({'team_df': team_df, 'match_df': match_df}, path)
+    os.utime(path, (mtime, mtime))
+
+
+def test_rebuild_reads_the_team_data_its_version_names(server, team_pkl, matches, tmp_path):
+    server.team_store().get()
+    rewrite(team_pkl, matches[1].iloc[:20], os.path.getmtime(team_pkl) + 10)
+    version = server.season_table_version()
+    path = str(tmp_path / 'season.sqlite')
+    server.rebuild_season_table(path, version)
+    assert table_version(path) == version
+    con = sqlite3.connect(path)
+    try:
+        assert con.execute('SELECT COUNT(*) FROM matches').fetchone()[0] == 2 * 20
+    finally:
+        con.close()
+
+
+def test_rebuild_does_not_stamp_a_version_it_did_not_read(server, team_pkl, matches, tmp_path):
+    version = server.season_table_version()
+    rewrite(team_pkl, matches[1].iloc[:20], os.path.getmtime(team_pkl) + 10)
+    path = str(tmp_path / 'season.sqlite')
+    with pytest.raises(RuntimeError, match='changed during'):
+        server.rebuild_season_table(path, version)
+    assert table_version(path) is None
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+import serve_async
+from serve_async import AsyncApp, OffloadPool, content_length
+
+
+def echo_app(environ, start_response):
+    """WSGI app answering with the length of the body it read"""
+    body = environ['wsgi.input'].read()
+    assert len(body) == int(environ['CONTENT_LENGTH'])
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [str(len(body)).encode(), b'|', environ['PATH_INFO'].encode()]
+
+
+def call(app, path='/predict', body=b'', headers=(), chunk_size=65536):
+    """Run one http request through an ASGI app; returns (status, headers, body)"""
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b'']
+    messages = [{'type': 'http.request', 'body': c, 'more_body': i < len(chunks) - 1}
+                for i, c in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': path, 'headers': list(headers)}
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    return start['status'], dict(start['headers']), b''.join(m.get('body', b'') for m in sent[1:])
+
+
+@pytest.fixture
+def app():
+    return AsyncApp(echo_app, OffloadPool(1, 0))
+
+
+@pytest.mark.parametrize('value', [b'abc', b'-1', b''])
+def test_malformed_content_length_is_a_bad_request(app, value):
+    status, _, _ = call(app, body=b'x', headers=[(b'content-length', value)])
+    assert status == 400
+
+
+def test_content_length():
+    assert content_length({'headers': [(b'Content-Length', b'12')]}) == 12
+    assert content_length({'headers': []}) is None
+
+
+def test_large_body_is_spooled_to_the_handler(app, monkeypatch):
+    monkeypatch.setattr(serve_async, 'SPOOL_MAX_BYTES', 1024)
+    body = bytes(range(256)) * 4096
+    status, _, text = call(app, body=body, headers=[(b'content-length', str(len(body)).encode())])
+    assert status == 200
+    assert text == f'{len(body)}|/predict'.encode()
+
+
+def test_max_body_is_enforced_without_a_declared_length():
+    app = AsyncApp(echo_app, OffloadPool(1, 0), max_body=100)
+    assert call(app, body=b'x' * 101, chunk_size=10)[0] == 413
+    assert call(app, body=b'x' * 100, chunk_size=10)[0] == 200
+
+
+def test_saturated_pool_answers_503_but_monitoring_still_runs(app):
+    assert app.pool.try_acquire()
+    status, headers, _ = call(app)
+    assert status == 503
+    assert headers[b'retry-after'] == str(serve_async.RETRY_AFTER_S).encode()
+    for path in serve_async.UNQUEUED_PATHS:
+        assert call(app, path=path)[0] == 200
+    app.pool.release()
+    assert call(app)[0] == 200
+    assert app.pool.in_flight == 0
@@ -0,0 +1,239 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from conftest import FEATURE_COLS, INPUT_SIZE
+
+
+@pytest.fixture
+def rows():
+    return np.random.default_rng(0).normal(size=(5, INPUT_SIZE)).astype(np.float32)
+
+
+def reference(server, X):
+    """scaler.transform + the full LSTM, outside every serving shortcut"""
+    Xs = torch.as_tensor(server.scaler.transform(X), dtype=torch.float32)
+    with torch.no_grad():
+        return server.recurrent_model()(Xs.unsqueeze(1)).reshape(-1).numpy()
+
+
+def test_predict_json_and_binary_match_the_model(server, client, rows):
+    r = client.post('/predict', json={'rows': rows.tolist()})
+    assert r.status_code == 200
+    assert np.allclose(r.get_json()['predictions'], reference(server, rows), atol=1e-5)
+    r = client.post('/predict?format=binary', data=rows.astype('<f4').tobytes(),
+                    content_type='application/octet-stream')
+    assert np.allclose(np.frombuffer(r.get_data(), '<f4'), reference(server, rows), atol=1e-5)
+
+
+@pytest.mark.parametrize('payload', [
+    {'rows': [{'a': 1}]},
+    {'rows': 'abc'},
+    {'rows': [[1.0, 2.0], [3.0]]},
+    {'rows': [[None] * INPUT_SIZE]},
+    {'rows': [[0.0] * 3]},
+])
+def test_predict_rejects_malformed_rows(client, payload):
+    r = client.post('/predict', json=payload)
+    assert r.status_code == 400
+    assert 'error' in r.get_json()
+
+
+def test_predict_rejects_non_finite_binary_rows(client):
+    X = np.zeros((1, INPUT_SIZE), '<f4')
+    X[0, 3] = np.inf
+    r = client.post('/predict', data=X.tobytes(), content_type='application/octet-stream')
+    assert r.status_code == 400
+
+
+def test_sequences_match_each_history_alone(server, client):
+    rng = np.random.default_rng(1)
+    seqs = [rng.normal(size=(n, INPUT_SIZE)) for n in (3, 1, 6, 2, 6)]
+    r = client.post('/predict', json={'sequences': [s.tolist() for s in seqs]})
+    assert r.status_code == 200
+    expected = []
+    for s in seqs:
+        Xs = torch.as_tensor(server.scaler.transform(s), dtype=torch.float32).unsqueeze(0)
+        with torch.no_grad():
+            expected.append(server.recurrent_model()(Xs).item())
+    assert np.allclose(r.get_json()['predictions'], expected, atol=1e-5)
+
+
+def test_sequence_groups_respect_the_row_limit(server, monkeypatch):
+    rng = np.random.default_rng(2)
+    seqs = [rng.normal(size=(n, INPUT_SIZE)).tolist() for n in (9, 1, 1, 1, 4)]
+    whole = server.predict_sequences(seqs)
+    monkeypatch.setattr(server, 'PREDICT_MAX_ROWS', 9)
+    assert np.allclose(server.predict_sequences(seqs), whole, atol=1e-6)
+
+
+@pytest.mark.parametrize('sequences', [
+    [{'a': 1}],
+    [[[1.0] * INPUT_SIZE, [1.0] * (INPUT_SIZE - 1)]],
+    [[[None] * INPUT_SIZE]],
+    [[]],
+])
+def test_sequences_reject_malformed_histories(client, sequences):
+    assert client.post('/predict', json={'sequences': sequences}).status_code == 400
+
+
+def test_sequences_limit_counts_rows_not_histories(server, client, monkeypatch):
+    monkeypatch.setattr(server, 'PREDICT_MAX_ROWS', 10)
+    r = client.post('/predict', json={'sequences': [[[0.0] * INPUT_SIZE] * 6] * 2})
+    assert r.status_code == 413
+
+
+def test_step_continues_a_team_history(server, client, rows):
+    client.delete('/predict/step/41')
+    for i in range(3):
+        r = client.post('/predict/step', json={'team_id': 41, 'row': rows[i].tolist()})
+    Xs = torch.as_tensor(server.scaler.transform(rows[:3]), dtype=torch.float32).unsqueeze(0)
+    with torch.no_grad():
+        assert abs(r.get_json()['predictions'][0] - server.recurrent_model()(Xs).item()) < 1e-5
+
+
+@pytest.mark.parametrize('team_id', [[1], {'a': 1}, True, 1.5])
+def test_step_rejects_unusable_team_ids(client, rows, team_id):
+    r = client.post('/predict/step', json={'team_id': team_id, 'row': rows[0].tolist()})
+    assert r.status_code == 400
+
+
+def test_step_team_ids_are_normalized_the_same_way_for_post_and_delete(client, rows):
+    client.post('/predict/step', json={'team_id': '77', 'row': rows[0].tolist()})
+    assert client.delete('/predict/step/77').get_json() == {'reset': True}
+    client.post('/predict/step', json={'team_id': 78, 'row': rows[0].tolist()})
+    assert client.delete('/predict/step/78').get_json() == {'reset': True}
+    assert client.delete('/predict/step/78').get_json() == {'reset': False}
+
+
+def csv_body(rows, bad_row=None):
+    lines = [','.join(FEATURE_COLS)] + [','.join(map(str, r)) for r in rows]
+    if bad_row is not None:
+        lines[bad_row + 1] = 'x' + lines[bad_row + 1][lines[bad_row + 1].index(','):]
+    return '\n'.join(lines) + '\n'
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_predict_csv_streams_every_chunk(server, client, monkeypatch, fmt):
+    monkeypatch.setattr(server, 'STREAM_CHUNK_ROWS', 4)
+    X = np.random.default_rng(3).normal(size=(10, INPUT_SIZE)).round(4)
+    r = client.post(f'/predict/csv?format={fmt}', data=csv_body(X), content_type='text/csv', buffered=True)
+    assert r.status_code == 200
+    lines = r.get_data(as_text=True).splitlines()
+    assert len(lines) == (11 if fmt == 'csv' else 10)
+    if fmt == 'ndjson':
+        got = [json.loads(l)['Predicted_Team_Goals'] for l in lines]
+        assert got == np.rint(reference(server, X.astype(np.float32))).astype(int).tolist()
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_predict_csv_ends_a_failed_stream_with_an_error_record(server, client, monkeypatch, fmt):
+    monkeypatch.setattr(server, 'STREAM_CHUNK_ROWS', 4)
+    X = np.random.default_rng(4).normal(size=(10, INPUT_SIZE)).round(4)
+    r = client.post(f'/predict/csv?format={fmt}', data=csv_body(X, bad_row=6), content_type='text/csv',
+                    buffered=True)
+    assert r.status_code == 200
+    last = r.get_data(as_text=True).splitlines()[-1]
+    if fmt == 'ndjson':
+        assert 'error' in json.loads(last)
+    else:
+        assert last.startswith('# error:')
+    assert 'team_app_stream_errors_total{route="predict_csv"}' in client.get('/metrics').get_data(as_text=True)
+
+
+def test_predict_csv_rejects_a_bad_first_chunk(client):
+    X = np.zeros((3, INPUT_SIZE))
+    r = client.post('/predict/csv', data=csv_body(X, bad_row=0), content_type='text/csv', buffered=True)
+    assert r.status_code == 400
+
+
+def test_feature_cols_reports_missing_columns(server, tmp_path, monkeypatch):
+    empty = tmp_path / 'attributes.txt'
+    empty.write_text('\n')
+    monkeypatch.setattr(server, 'FEATURE_COLS_PATH', str(empty))
+    server.feature_cols.cache_clear()
+    try:
+        with pytest.raises(ValueError, match='missing or empty'):
+            server.feature_cols()
+        empty.write_text('\n'.join(FEATURE_COLS[:13]))
+        with pytest.raises(ValueError, match='lists 13 feature columns'):
+            server.feature_cols()
+    finally:
+        server.feature_cols.cache_clear()
+
+
+def test_goal_plot_is_rendered_from_its_key(server, client):
+    counts = pd.DataFrame({'Actual_Team_Goals': [0, 1, 1, 2, 6, 7]})
+    with server.app.test_request_context():
+        url = server.goal_distribution_url(counts)
+    assert url == '/plot/goals/1-2-1-0-0-0-2.png'
+    r = client.get(url)
+    assert r.status_code == 200 and r.mimetype == 'image/png'
+    assert r.get_data().startswith(b'\x89PNG')
+    assert r.cache_control.max_age == 86400
+
+
+@pytest.mark.parametrize('key', ['1-2-3', 'a-b-c-d-e-f-g', '1-2-1-0-0-0--2', '1-2-1-0-0-0-2-0', '1.5-2-1-0-0-0-2'])
+def test_goal_plot_rejects_malformed_keys(client, key):
+    assert client.get(f'/plot/goals/{key}.png').status_code == 404
+
+
+def test_metrics_and_stats(client, rows):
+    client.post('/predict', json={'rows': rows.tolist()})
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'team_app_requests_total{route="predict",status="200"}' in text
+    assert 'team_app_stage_seconds_count{stage="scaler_transform"}' in text
+    assert 'queue_wait_s' not in text
+    stats = client.get('/predict/stats').get_json()
+    assert {'batcher', 'cache', 'team_states'} <= stats.keys()
+
+
+def test_profiled_request_writes_a_profile(server, client, rows, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'PROFILE_REQUESTS', True)
+    monkeypatch.setattr(server, 'PROFILE_DIR', str(tmp_path))
+    r = client.post('/predict?profile=1', json={'rows': rows.tolist()})
+    assert r.status_code == 200
+    assert os.path.exists(r.headers['X-Profile'])
+    assert 'X-Profile' not in client.post('/predict', json={'rows': rows.tolist()}).headers
+
+
+def test_failing_profiled_request_releases_the_profiler(server, client, rows, tmp_path, monkeypatch):
+    def fail(X):
+        raise RuntimeError("model failed")
+    monkeypatch.setattr(server, 'PROFILE_REQUESTS', True)
+    monkeypatch.setattr(server, 'PROFILE_DIR', str(tmp_path))
+    predict_rows = server.predict_rows
+    monkeypatch.setattr(server, 'predict_rows', fail)
+    monkeypatch.setitem(server.app.config, 'PROPAGATE_EXCEPTIONS', True)   # as under debug=True
+    with pytest.raises(RuntimeError):
+        client.post('/predict?profile=1', json={'rows': rows.tolist()})
+    assert not server.profile_lock.locked()
+    assert len(os.listdir(tmp_path)) == 1
+    monkeypatch.setattr(server, 'predict_rows', predict_rows)
+    assert 'X-Profile' in client.post('/predict?profile=1', json={'rows': rows.tolist()}).headers
+
+
+def test_oversized_bodies_are_refused_before_they_are_read(server, client, monkeypatch):
+    monkeypatch.setattr(server, 'PREDICT_MAX_ROWS', 4)
+    parsed = []
+    monkeypatch.setattr(server, 'parse_predict_rows', lambda: parsed.append(1))
+    X = np.zeros((5, INPUT_SIZE), '<f4')
+    r = client.post('/predict', data=X.tobytes(), content_type='application/octet-stream')
+    assert r.status_code == 413 and not parsed
+    r = client.post('/predict', data=b'[' + b' ' * (4 * server.JSON_ROW_BYTES) + b']',
+                    content_type='application/json')
+    assert r.status_code == 413 and not parsed
+
+
+def test_bodies_at_the_row_limit_are_accepted(server, client, monkeypatch):
+    monkeypatch.setattr(server, 'PREDICT_MAX_ROWS', 4)
+    X = np.random.default_rng(5).normal(size=(4, INPUT_SIZE))
+    r = client.post('/predict', data=X.astype('<f4').tobytes(), content_type='application/octet-stream')
+    assert r.status_code == 200
+    r = client.post('/predict', data=json.dumps({'rows': X.tolist()}, indent=4),
+                    content_type='application/json')
+    assert r.status_code == 200
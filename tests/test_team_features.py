@@ -0,0 +1,47 @@
+import numpy as np
+
+from conftest import FEATURE_COLS
+from team_features import match_features, outcomes, team_perspective
+
+
+def swapped(col, columns):
+    """Row-wise reference: the column the away team's value is read from"""
+    for a, b in (('home', 'away'), ('away', 'home')):
+        other = col.replace(a, b)
+        if a in col and other in columns:
+            return other
+    return col
+
+
+def test_match_features_match_row_wise_reference(matches):
+    _, match_df = matches
+    X_home, X_away, home_goals, away_goals = match_features(match_df, FEATURE_COLS)
+    for i, (_, row) in enumerate(match_df.iterrows()):
+        home = [1.0 if c == 'is_home' else row[c] for c in FEATURE_COLS]
+        away = [0.0 if c == 'is_home' else row[swapped(c, match_df.columns)] for c in FEATURE_COLS]
+        assert np.allclose(X_home[i], home)
+        assert np.allclose(X_away[i], away)
+        assert home_goals[i] == row['home_team_goal']
+        assert away_goals[i] == row['away_team_goal']
+
+
+def test_team_perspective_picks_the_team_side(matches):
+    team_df, match_df = matches
+    team_id = match_df['home_team_api_id'].iloc[0]
+    rows = match_df[(match_df['home_team_api_id'] == team_id) | (match_df['away_team_api_id'] == team_id)]
+    names = dict(zip(team_df['team_api_id'], team_df['team_long_name']))
+    table, X_team, X_opp = team_perspective(rows, team_id, FEATURE_COLS, names)
+    X_home, X_away, _, _ = match_features(rows, FEATURE_COLS)
+    is_home = (rows['home_team_api_id'] == team_id).to_numpy()
+    assert np.array_equal(X_team[is_home], X_home[is_home])
+    assert np.array_equal(X_team[~is_home], X_away[~is_home])
+    assert np.array_equal(X_opp[is_home], X_away[is_home])
+    assert list(table['Venue']) == ['Home' if h else 'Away' for h in is_home]
+    team_goals = np.where(is_home, rows['home_team_goal'], rows['away_team_goal'])
+    assert np.array_equal(table['Actual_Team_Goals'], team_goals)
+
+
+def test_outcomes_and_points():
+    labels, points = outcomes([2, 1, 0], [1, 1, 3])
+    assert list(labels) == ['Win', 'Draw', 'Loss']
+    assert list(points) == [3, 1, 0]
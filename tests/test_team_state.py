@@ -0,0 +1,59 @@
+import numpy as np
+import torch
+
+from conftest import INPUT_SIZE
+from team_state import TeamStateCache
+
+
+def full_history(model, rows):
+    with torch.no_grad():
+        return model(torch.as_tensor(np.asarray(rows)).unsqueeze(0)).item()
+
+
+def test_step_matches_full_history_forward(model):
+    rng = np.random.default_rng(0)
+    cache = TeamStateCache(model)
+    history = {}
+    for team in [1, 2, 1, 3, 1, 2, 3, 3]:
+        row = rng.normal(size=INPUT_SIZE).astype(np.float32)
+        history.setdefault(team, []).append(row)
+        pred = cache.step([team], row[None])[0]
+        assert abs(pred - full_history(model, history[team])) < 1e-5
+
+
+def test_repeated_team_in_one_call_applies_rows_in_order(model):
+    X = np.random.default_rng(1).normal(size=(4, INPUT_SIZE)).astype(np.float32)
+    preds = TeamStateCache(model).step([7, 8, 7, 7], X)
+    assert abs(preds[0] - full_history(model, X[[0]])) < 1e-5
+    assert abs(preds[2] - full_history(model, X[[0, 2]])) < 1e-5
+    assert abs(preds[3] - full_history(model, X[[0, 2, 3]])) < 1e-5
+
+
+def test_eviction_waits_until_the_whole_call_is_applied(model):
+    # Team 1's second row comes after two other teams; with room for two
+    # states it must still continue from its first row, not from zero
+    X = np.random.default_rng(2).normal(size=(4, INPUT_SIZE)).astype(np.float32)
+    cache = TeamStateCache(model, max_teams=2)
+    preds = cache.step([1, 2, 3, 1], X)
+    assert abs(preds[3] - full_history(model, X[[0, 3]])) < 1e-5
+    assert cache.stats()['teams'] == 2
+
+
+def test_least_recently_updated_team_is_evicted(model):
+    X = np.random.default_rng(3).normal(size=(4, INPUT_SIZE)).astype(np.float32)
+    cache = TeamStateCache(model, max_teams=2)
+    cache.step([1], X[[0]])
+    cache.step([2], X[[1]])
+    cache.step([3], X[[2]])
+    assert cache.stats()['evictions'] == 1
+    # Team 1 was dropped and restarts from a zero state
+    assert abs(cache.step([1], X[[3]])[0] - full_history(model, X[[3]])) < 1e-5
+
+
+def test_reset_drops_a_team_state(model):
+    X = np.random.default_rng(4).normal(size=(2, INPUT_SIZE)).astype(np.float32)
+    cache = TeamStateCache(model)
+    cache.step([5], X[[0]])
+    assert cache.reset(5)
+    assert not cache.reset(5)
+    assert abs(cache.step([5], X[[1]])[0] - full_history(model, X[[1]])) < 1e-5
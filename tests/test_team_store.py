@@ -0,0 +1,93 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from team_store import TeamData, TeamStore
+
+
+@pytest.fixture
+def team_data(matches):
+    team_df, match_df = matches
+    return TeamData(team_df, match_df, mtime=0)
+
+
+def test_matches_by_team_lists_every_match_of_a_team(team_data, matches):
+    team_df, match_df = matches
+    for team_id, rows in team_data.matches_by_team.items():
+        played = (match_df['home_team_api_id'] == team_id) | (match_df['away_team_api_id'] == team_id)
+        assert sorted(rows) == sorted(played[played].index)
+    assert team_data.team_names == sorted(team_df['team_long_name'])
+
+
+def test_unknown_team_has_no_matches(team_data):
+    assert team_data.team_matches(-1).empty
+    assert len(team_data.team_match_rows(-1)) == 0
+
+
+def scan(match_df, team_id, start=None, end=None):
+    """Reference: boolean-mask scan over match_df, as before the date index"""
+    dates = pd.to_datetime(match_df['date'])
+    mask = (match_df['home_team_api_id'] == team_id) | (match_df['away_team_api_id'] == team_id)
+    if start:
+        mask &= dates >= pd.Timestamp(start)
+    if end:
+        mask &= dates < pd.Timestamp(end) + pd.Timedelta(days=1)
+    rows = np.flatnonzero(mask.to_numpy())
+    return rows[np.argsort(dates.to_numpy()[rows], kind='stable')]
+
+
+def test_team_matches_are_in_date_order(team_data, matches):
+    for team_id in team_data.matches_by_team:
+        dates = pd.to_datetime(team_data.team_matches(team_id)['date'])
+        assert dates.is_monotonic_increasing
+        assert np.array_equal(team_data.matches_by_team[team_id], scan(matches[1], team_id))
+
+
+def test_date_index_matches_mask_scan(team_data, matches):
+    match_df = matches[1]
+    day_of = pd.to_datetime(match_df['date']).dt.strftime('%Y-%m-%d')
+    rng = np.random.default_rng(0)
+    bounds = [None, '', '2010-07-01', '2011-12-31'] + list(rng.choice(day_of, 20))
+    for team_id in team_data.matches_by_team:
+        for start in bounds:
+            for end in bounds[::3]:
+                got = team_data.team_match_rows(team_id, start, end)
+                assert np.array_equal(got, scan(match_df, team_id, start, end)), (team_id, start, end)
+
+
+def test_end_date_covers_its_whole_day(team_data, matches):
+    match_df = matches[1]
+    row = 0
+    team_id = match_df['home_team_api_id'].iloc[row]
+    day = pd.Timestamp(match_df['date'].iloc[row]).strftime('%Y-%m-%d')
+    assert row in team_data.team_match_rows(team_id, day, day)
+
+
+def test_store_reloads_when_the_file_changes(tmp_path, matches):
+    team_df, match_df = matches
+    path = tmp_path / 'team.pkl'
+    with open(path, 'wb') as f:
+        pickle.dump({'team_df': team_df, 'match_df': match_df}, f)
+    store = TeamStore(str(path), check_interval=0)
+    first = store.get()
+    with open(path, 'wb') as f:
+        pickle.dump({'team_df': team_df, 'match_df': match_df.iloc[:10]}, f)
+    os.utime(path, (first.mtime + 10, first.mtime + 10))
+    assert len(store.get().match_df) == 10
+
+
+def test_recheck_sees_a_change_within_the_check_interval(tmp_path, matches):
+    team_df, match_df = matches
+    path = tmp_path / 'team.pkl'
+    with open(path, 'wb') as f:
+        pickle.dump({'team_df': team_df, 'match_df': match_df}, f)
+    store = TeamStore(str(path), check_interval=3600)
+    first = store.get()
+    with open(path, 'wb') as f:
+        pickle.dump({'team_df': team_df, 'match_df': match_df.iloc[:10]}, f)
+    os.utime(path, (first.mtime + 10, first.mtime + 10))
+    assert store.get() is first
+    assert store.get(recheck=True).mtime == first.mtime + 10